@@ -3,12 +3,15 @@ import sqlite3
 import os
 import sys
 
+from db import DB_FILE
+from schema import ensure_schema
+
 # Fix encoding for Windows
 if sys.platform == 'win32':
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
 # Database file path
-db_file = "fantasy_cricket.db"
+db_file = DB_FILE
 
 print("Starting player database setup...\n")
 
@@ -25,6 +28,10 @@ try:
     if os.path.exists(db_file):
         os.remove(db_file)
         print("[SUCCESS] Old database deleted\n")
+    # WAL side files belong to the deleted database
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
 except Exception as e:
     print(f"[WARNING] Could not delete database: {e}")
     print("[INFO] Continuing anyway...\n")
@@ -37,6 +44,7 @@ try:
     # Drop existing tables if they exist
     c.execute("DROP TABLE IF EXISTS stats")
     c.execute("DROP TABLE IF EXISTS teams")
+    c.execute("DROP TABLE IF EXISTS team_players")
     
     # Create fresh tables
     c.execute('''CREATE TABLE stats
@@ -49,10 +57,10 @@ try:
     
     c.execute('''CREATE TABLE teams
                  (name TEXT PRIMARY KEY,
-                  players TEXT,
-                  points_used INTEGER)''')
+                  points_used INTEGER,
+                  created_at TEXT)''')
     
-    conn.commit()
+    ensure_schema(conn)
     print("[SUCCESS] Fresh tables created\n")
     
 except Exception as e:
@@ -1,35 +1,45 @@
-from flask import Flask, render_template, request, jsonify, session
-import sqlite3
+from flask import Flask, Response, render_template, request, jsonify, session
 import json
-from datetime import datetime
-from scoring_engine import calculate_score
+from catalogue import get_catalogue
+from leaderboard import get_leaderboard
+from db import DB_FILE, begin_write, connection
+import instrumentation
+from instrumentation import timed
+from schema import ensure_schema
+import live_scoring
+import player_search
+import projection
+import score_feed
+import serialization
+import team_solver
+import team_store
+import team_validation
 
 app = Flask(__name__)
 app.secret_key = 'fantasy_cricket_secret_2026'
 
-# Database connection
-def get_db():
-    conn = sqlite3.connect("fantasy_cricket.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+LEADERBOARD_MAX_PAGE = 200
+TEAMS_DEFAULT_PAGE = 50
+TEAMS_MAX_PAGE = 200
+TEAM_FIELDS = ('id', 'name', 'players', 'points_used', 'created_at')
+CATEGORIES = [
+    {'id': 'BAT', 'name': 'Batsmen', 'icon': '🏏'},
+    {'id': 'BWL', 'name': 'Bowlers', 'icon': '⚡'},
+    {'id': 'WK', 'name': 'Wicket Keeper', 'icon': '🧤'},
+    {'id': 'AR', 'name': 'All Rounder', 'icon': '⚙️'}
+]
 
+instrumentation.install(app)
+serialization.install(app)
+ensure_schema()
+catalogue = get_catalogue()
+leaderboard = get_leaderboard()
+feed = score_feed.get_feed()
+
+@timed('get_player_value')
 def get_player_value(player_name):
     """Return integer value for a player (safe conversion)."""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT value FROM stats WHERE player=?", (player_name,))
-    row = c.fetchone()
-    conn.close()
-    
-    if row:
-        try:
-            return int(row[0])
-        except (ValueError, TypeError):
-            try:
-                return int(float(row[0]))
-            except:
-                return 0 
-    return 0
+    return catalogue.value(player_name)
 
 @app.route('/')
 def index():
@@ -39,50 +49,109 @@ def index():
 @app.route('/api/players/<category>')
 def get_players(category):
     """Get players by category"""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT player FROM stats WHERE ctg=? ORDER BY player", (category,))
-    players = [row[0] for row in c.fetchall()]
-    conn.close()
-    return jsonify(players)
+    version, loaded_at = catalogue.current()
+    response = serialization.cached_response(('players', category, version),
+                                             lambda: catalogue.players(category))
+    response.set_etag(f'players-{category}-{version}', weak=True)
+    response.last_modified = loaded_at
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/players/search')
+def search_players():
+    """Autocomplete: best matches for ?q= (prefix or misspelt), optionally ?category="""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q required'}), 400
+    try:
+        limit = min(player_search.MAX_LIMIT, int(request.args.get('limit', player_search.DEFAULT_LIMIT)))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    players = catalogue.search(query, limit, request.args.get('category'))
+    return jsonify([{
+        'name': info.name,
+        'category': info.ctg,
+        'value': info.value
+    } for info in players])
+
+@app.route('/api/players/details')
+def get_players_details():
+    """Get full details for a category (?category=) and/or names (?name=...)"""
+    category = request.args.get('category')
+    names = request.args.getlist('name')
+    if not category and not names:
+        return jsonify({'error': 'category or name required'}), 400
+    
+    def details():
+        players, _, _ = catalogue.details(category, names)
+        return [{
+            'name': info.name,
+            'category': info.ctg,
+            'value': info.value,
+            'runs': info.runs,
+            'wickets': info.wickets
+        } for info in players]
+    
+    version, loaded_at = catalogue.current()
+    if names:
+        response = jsonify(details())
+    else:
+        # A whole category is the same body until the stats version moves
+        response = serialization.cached_response(('details', category, version), details)
+    # Same URL + same stats version means the same body
+    response.set_etag(f'players-{version}', weak=True)
+    response.last_modified = loaded_at
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/api/player-value/<player_name>')
 def get_player_info(player_name):
     """Get player value and stats"""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT player, ctg, value, runs, wickets FROM stats WHERE player=?", (player_name,))
-    row = c.fetchone()
-    conn.close()
+    info = catalogue.get(player_name)
     
-    if row:
+    if info:
         return jsonify({
-            'name': row[0],
-            'category': row[1],
-            'value': int(row[2]),
-            'runs': int(row[3]) if row[3] else 0,
-            'wickets': int(row[4]) if row[4] else 0
+            'name': info.name,
+            'category': info.ctg,
+            'value': info.value,
+            'runs': info.runs,
+            'wickets': info.wickets
         })
     return jsonify({'error': 'Player not found'}), 404
 
 @app.route('/api/teams', methods=['GET'])
 def get_teams():
-    """Get all saved teams"""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT name, players, points_used FROM teams ORDER BY rowid DESC")
+    """Saved teams, newest first, one page at a time.
+
+    ?limit= page size, ?cursor= the previous page's next_cursor,
+    ?prefix= team name prefix, ?player= teams containing a player,
+    ?fields= comma-separated subset of TEAM_FIELDS
+    """
+    try:
+        limit = min(TEAMS_MAX_PAGE, max(1, int(request.args.get('limit', TEAMS_DEFAULT_PAGE))))
+        cursor = request.args.get('cursor')
+        before = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'limit and cursor must be integers'}), 400
+    
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or list(TEAM_FIELDS)
+    unknown = [f for f in fields if f not in TEAM_FIELDS]
+    if unknown:
+        return jsonify({'error': f'Unknown field: {unknown[0]}'}), 400
+    
+    with connection() as conn:
+        rows, next_cursor = team_store.list_teams(
+            conn, limit, before,
+            prefix=request.args.get('prefix'),
+            player=request.args.get('player'),
+            with_players='players' in fields)
     teams = []
-    for row in c.fetchall():
-        players = row[1].split(',') if row[1] else []
-        teams.append({
-            'id': row[0],
-            'name': row[0],
-            'players': players,
-            'points_used': row[2],
-            'created_at': datetime.now().isoformat()
-        })
-    conn.close()
-    return jsonify(teams)
+    for name, players, points_used, created_at in rows:
+        team = {'id': name, 'name': name, 'players': players,
+                'points_used': points_used, 'created_at': created_at}
+        teams.append({f: team[f] for f in fields})
+    return jsonify({'teams': teams, 'limit': limit, 'next_cursor': next_cursor})
 
 @app.route('/api/team/save', methods=['POST'])
 def save_team():
@@ -97,21 +166,71 @@ def save_team():
     if not players:
         return jsonify({'error': 'Add at least one player'}), 400
     
-    # Calculate points used
-    points_used = sum(get_player_value(p) for p in players)
+    try:
+        with connection() as conn:
+            begin_write(conn)
+            with leaderboard.tracking(conn) as changed:
+                lineup = team_validation.save_team(conn, team_name, players)
+                changed.add(team_name)
+        return jsonify({'success': True, 'message': 'Team saved successfully!',
+                        'points_used': lineup.points_used})
+    except (team_validation.TeamValidationError, team_store.UnknownPlayerError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/team/suggest')
+def suggest_team():
+    """Best-scoring XI within the budget and role minimums"""
+    try:
+        budget = int(request.args.get('budget', team_solver.BUDGET))
+    except ValueError:
+        return jsonify({'error': 'budget must be an integer'}), 400
+    if budget < 0:
+        return jsonify({'error': 'budget must not be negative'}), 400
+    budget = min(team_solver.BUDGET, budget)
     
-    if points_used > 100:
-        return jsonify({'error': 'Team exceeds 100 points'}), 400
+    try:
+        result = team_solver.suggest_team(budget)
+        if result is None:
+            return jsonify({'error': 'No valid team fits the budget'}), 404
+        players, total_points, points_used = result
+        return jsonify({
+            'players': players,
+            'projected_points': total_points,
+            'points_used': points_used
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def summary_json(summary):
+    data = {'mean': round(summary.mean, 2), 'std': round(summary.std, 2)}
+    data.update({f'p{p}': value for p, value in summary.percentiles.items()})
+    return data
+
+@app.route('/api/team/projection')
+def project_team():
+    """Simulated points for a lineup (?player=...&player=...&simulations=)"""
+    players = request.args.getlist('player')
+    if not players:
+        return jsonify({'error': 'player required'}), 400
+    if len(players) > team_validation.TEAM_SIZE:
+        return jsonify({'error': f'At most {team_validation.TEAM_SIZE} players'}), 400
+    try:
+        simulations = int(request.args.get('simulations', projection.DEFAULT_SIMULATIONS))
+    except ValueError:
+        return jsonify({'error': 'simulations must be an integer'}), 400
+    if not 1 <= simulations <= projection.MAX_SIMULATIONS:
+        return jsonify({'error': f'simulations must be 1-{projection.MAX_SIMULATIONS}'}), 400
     
     try:
-        conn = get_db()
-        c = conn.cursor()
-        players_str = ",".join(players)
-        c.execute("INSERT OR REPLACE INTO teams VALUES (?,?,?)", 
-                 (team_name, players_str, points_used))
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True, 'message': 'Team saved successfully!'})
+        result = projection.project(players, simulations)
+        return jsonify({
+            'simulations': result.simulations,
+            'team': summary_json(result.team),
+            'players': {name: dict(summary_json(summary), lines=result.history[name])
+                        for name, summary in result.players.items()}
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -119,11 +238,11 @@ def save_team():
 def delete_team(team_name):
     """Delete a team"""
     try:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("DELETE FROM teams WHERE name=?", (team_name,))
-        conn.commit()
-        conn.close()
+        with connection() as conn:
+            begin_write(conn)
+            with leaderboard.tracking(conn) as changed:
+                team_store.delete_team(conn, team_name)
+                changed.add(team_name)
         return jsonify({'success': True, 'message': 'Team deleted successfully!'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -132,27 +251,18 @@ def delete_team(team_name):
 def evaluate_team_score(team_name):
     """Calculate team score"""
     try:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT players FROM teams WHERE name=?", (team_name,))
-        row = c.fetchone()
-        conn.close()
-        
-        if not row:
-            return jsonify({'error': 'Team not found'}), 404
-        
-        players = row[0].split(',') if row[0] else []
+        with connection() as conn:
+            players = team_store.team_players(conn, team_name)
         
-        if not players:
-            return jsonify({'error': 'Team has no players'}), 400
+            if players is None:
+                return jsonify({'error': 'Team not found'}), 404
         
-        total_score = 0
-        player_scores = {}
+            if not players:
+                return jsonify({'error': 'Team has no players'}), 400
         
-        for player in players:
-            score = calculate_score(player)
-            player_scores[player] = score
-            total_score += score
+            # Materialized by live_scoring; no rescoring on each poll
+            player_scores = live_scoring.player_points(conn, players)
+            total_score = live_scoring.team_total(conn, team_name)
         
         return jsonify({
             'team_name': team_name,
@@ -163,16 +273,112 @@ def evaluate_team_score(team_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/team/scores/stream')
+def stream_team_scores():
+    """Server-Sent Events for ?team=...&team=...: a snapshot of their
+    totals, then a 'scores' event with just the totals that change"""
+    teams = request.args.getlist('team')
+    if not teams:
+        return jsonify({'error': 'team required'}), 400
+    if len(teams) > score_feed.MAX_TEAMS:
+        return jsonify({'error': f'At most {score_feed.MAX_TEAMS} teams per stream'}), 400
+    
+    subscription = feed.subscribe(teams)
+    
+    def events():
+        try:
+            yield score_feed.format_event('snapshot', feed.current(subscription))
+            while not subscription.closed:
+                changes = subscription.wait(score_feed.KEEPALIVE)
+                yield score_feed.format_event('scores', changes) if changes else score_feed.KEEPALIVE_EVENT
+        finally:
+            feed.unsubscribe(subscription)
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/match/<int:match_id>/deltas', methods=['POST'])
+def ingest_match_deltas(match_id):
+    """Apply live stat deltas: {"deltas": {player: {stat: increment}}}"""
+    data = request.get_json(silent=True) or {}
+    deltas = data.get('deltas')
+    if not isinstance(deltas, dict) or not all(isinstance(d, dict) for d in deltas.values()):
+        return jsonify({'error': 'deltas must map player -> {stat: increment}'}), 400
+    
+    try:
+        with connection() as conn:
+            # Read-modify-write of match rows: hold the write lock throughout
+            begin_write(conn)
+            with leaderboard.tracking(conn) as changed:
+                point_deltas = live_scoring.apply_deltas(conn, match_id, deltas)
+                for player in point_deltas:
+                    changed.update(team_store.teams_containing(conn, player))
+        return jsonify({'success': True, 'match_id': match_id, 'point_deltas': point_deltas})
+    except (live_scoring.InvalidDeltaError, ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/leaderboard')
+def get_leaderboard_page():
+    """Ranked teams, paginated with ?offset=&limit="""
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(LEADERBOARD_MAX_PAGE, max(1, int(request.args.get('limit', 50))))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    
+    return jsonify({
+        'total_teams': len(leaderboard),
+        'offset': offset,
+        'limit': limit,
+        'teams': [{'rank': rank, 'team_name': name, 'total_score': total}
+                  for rank, name, total in leaderboard.top(offset, limit)]
+    })
+
+@app.route('/api/leaderboard/rank/<team_name>')
+def get_team_rank(team_name):
+    """Rank of one team"""
+    found = leaderboard.rank(team_name)
+    if found is None:
+        return jsonify({'error': 'Team not found'}), 404
+    rank, total = found
+    return jsonify({
+        'team_name': team_name,
+        'rank': rank,
+        'total_score': total,
+        'total_teams': len(leaderboard)
+    })
+
+@app.route('/api/leaderboard/snapshot', methods=['POST'])
+def save_leaderboard_snapshot():
+    """Persist the current ranking to leaderboard_snapshot"""
+    try:
+        with connection() as conn:
+            count = leaderboard.save_snapshot(conn)
+        return jsonify({'success': True, 'teams': count})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/player-ownership')
+@app.route('/api/player-ownership/<player_name>')
+def get_player_ownership(player_name=None):
+    """Share of saved teams that own each player (or one player)"""
+    with connection() as conn:
+        owned = team_store.ownership(conn, player_name)
+    if player_name is not None and player_name not in owned:
+        if not catalogue.get(player_name):
+            return jsonify({'error': 'Player not found'}), 404
+        owned[player_name] = (0, 0.0)
+    # Every player when no name is given: encode as it goes out
+    return serialization.streamed_response(serialization.stream_object(
+        (name, {'teams': count, 'ownership_pct': pct})
+        for name, (count, pct) in owned.items()))
+
 @app.route('/api/categories')
 def get_categories():
     """Get all player categories"""
-    categories = [
-        {'id': 'BAT', 'name': 'Batsmen', 'icon': '🏏'},
-        {'id': 'BWL', 'name': 'Bowlers', 'icon': '⚡'},
-        {'id': 'WK', 'name': 'Wicket Keeper', 'icon': '🧤'},
-        {'id': 'AR', 'name': 'All Rounder', 'icon': '⚙️'}
-    ]
-    return jsonify(categories)
+    return serialization.cached_response('categories', lambda: CATEGORIES)
 
 @app.errorhandler(404)
 def not_found(e):
@@ -184,7 +390,7 @@ def server_error(e):
 
 if __name__ == '__main__':
     print("[INFO] Starting Fantasy Cricket Flask App")
-    print("[INFO] Database: fantasy_cricket.db")
+    print(f"[INFO] Database: {DB_FILE}")
     print("[INFO] Running on http://localhost:5000")
-    print("[INFO] Press Ctrl+C to stop\n")
+    print("[INFO] Press Ctrl+C to stop (production: python asgi.py)\n")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
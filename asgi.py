@@ -0,0 +1,337 @@
+"""ASGI entry point for production serving.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+    python asgi.py
+
+The event loop holds the client connections; the Flask app runs on two
+bounded thread pools. Reads (GET/HEAD/OPTIONS) use one pool and writes
+use a small separate one, so a burst of saves waiting on SQLite's single
+writer lock never starves score polls. Under WAL, readers don't block on
+that writer. Route contracts are the Flask ones, unchanged. Read workers
+never rebuild stale score totals themselves (that needs the write lock):
+they serve the last committed totals and queue one rebuild on the write
+pool.
+
+Each response streams through a queue of at most RESPONSE_QUEUE chunks,
+so a slow client stalls its own worker rather than buffering the body.
+
+The live-score stream (SSE_PATH) is served on the event loop itself
+rather than through Flask, so open streams cost a coroutine each and
+never hold a worker thread.
+"""
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import db
+
+READ_WORKERS = int(os.environ.get("FANTASY_CRICKET_READ_WORKERS", "32"))
+WRITE_WORKERS = int(os.environ.get("FANTASY_CRICKET_WRITE_WORKERS", "2"))
+MAX_BODY = 10 * 1024 * 1024
+# Response chunks buffered per request before the worker waits on the client
+RESPONSE_QUEUE = 16
+# Threads outside the worker pools that use the database: the score feed ticker
+BACKGROUND_THREADS = 1
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+SSE_PATH = "/api/team/scores/stream"
+
+# One pooled connection per thread, so nothing waits on the pool
+db.configure_pool(READ_WORKERS + WRITE_WORKERS + BACKGROUND_THREADS)
+
+from app import app as flask_app  # noqa: E402
+import live_scoring  # noqa: E402
+import score_feed  # noqa: E402
+
+
+def build_environ(scope, body):
+    """WSGI environ (PEP 3333) for an ASGI HTTP scope."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": _BodyReader(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif key == "CONTENT_LENGTH":
+            continue
+        else:
+            key = "HTTP_" + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class _BodyReader:
+    """Minimal wsgi.input over an already-received body."""
+
+    def __init__(self, body):
+        self._body = body
+        self._pos = 0
+
+    def read(self, size=-1):
+        end = len(self._body) if size is None or size < 0 else self._pos + size
+        data = self._body[self._pos:end]
+        self._pos += len(data)
+        return data
+
+    def readline(self, size=-1):
+        newline = self._body.find(b"\n", self._pos)
+        end = len(self._body) if newline < 0 else newline + 1
+        if size is not None and size >= 0:
+            end = min(end, self._pos + size)
+        return self.read(end - self._pos)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+class WSGIBridge:
+    """ASGI application that runs a WSGI app on bounded thread pools.
+
+    Response chunks are handed to the event loop as the WSGI iterable
+    yields them, so streaming responses stream.
+    """
+
+    def __init__(self, wsgi_app, read_workers=READ_WORKERS, write_workers=WRITE_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.readers = ThreadPoolExecutor(read_workers, thread_name_prefix="asgi-read")
+        self.writers = ThreadPoolExecutor(write_workers, thread_name_prefix="asgi-write")
+        self._rebuild_pending = False
+        self._rebuild_lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == SSE_PATH and scope["method"] == "GET":
+                await self._stream_scores(scope, receive, send)
+            else:
+                await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.readers.shutdown(wait=False)
+                self.writers.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY:
+                await _plain(send, 413, b'{"error": "Request body too large"}')
+                return
+            if not message.get("more_body"):
+                break
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(RESPONSE_QUEUE)
+        gone = threading.Event()
+        reading = scope["method"] in READ_METHODS
+        environ = build_environ(scope, bytes(body))
+        worker = loop.run_in_executor(self.readers if reading else self.writers,
+                                      self._run, environ, loop, queue, gone, reading)
+
+        started = False
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "start":
+                    status, headers = payload
+                    await send({"type": "http.response.start", "status": status, "headers": headers})
+                    started = True
+                elif kind == "body":
+                    await send({"type": "http.response.body", "body": payload, "more_body": True})
+                elif kind == "end":
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    break
+                elif kind == "error":
+                    if started:
+                        # Too late for a 500: end the response as it stands
+                        await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    else:
+                        await _plain(send, 500, b'{"error": "Server error"}')
+                    break
+        finally:
+            if not worker.done():
+                # Stopped early: unblock the worker so it can clean up
+                gone.set()
+                while not queue.empty():
+                    queue.get_nowait()
+            await worker
+
+    async def _stream_scores(self, scope, receive, send):
+        """Async twin of app.stream_team_scores."""
+        teams = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("team", [])
+        if not teams:
+            await _plain(send, 400, b'{"error": "team required"}')
+            return
+        if len(teams) > score_feed.MAX_TEAMS:
+            await _plain(send, 400, f'{{"error": "At most {score_feed.MAX_TEAMS} teams per stream"}}'.encode())
+            return
+
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass    # loop already closed
+
+        feed = score_feed.get_feed()
+        subscription = feed.subscribe(teams, notify)
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            snapshot = await loop.run_in_executor(self.readers, feed.current, subscription)
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                    (b"cache-control", b"no-cache"),
+                                    (b"x-accel-buffering", b"no")]})
+            await _event(send, score_feed.format_event("snapshot", snapshot))
+            while not disconnected.done():
+                waiter = asyncio.ensure_future(ready.wait())
+                done, _ = await asyncio.wait({waiter, disconnected}, timeout=score_feed.KEEPALIVE,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if disconnected in done:
+                    break
+                if waiter in done:
+                    ready.clear()
+                    changes = subscription.drain()
+                    if changes:
+                        await _event(send, score_feed.format_event("scores", changes))
+                else:
+                    await _event(send, score_feed.KEEPALIVE_EVENT)
+        finally:
+            disconnected.cancel()
+            feed.unsubscribe(subscription)
+
+    def _schedule_rebuild(self):
+        """Queue one score totals rebuild on the write pool."""
+        with self._rebuild_lock:
+            if self._rebuild_pending:
+                return
+            self._rebuild_pending = True
+        self.writers.submit(self._rebuild)
+
+    def _rebuild(self):
+        with self._rebuild_lock:
+            self._rebuild_pending = False
+        try:
+            with db.connection() as conn:
+                live_scoring.ensure_totals(conn)
+        except Exception as e:
+            print(f"[ERROR] Score totals rebuild failed: {e}", file=sys.stderr)
+
+    def _run(self, environ, loop, queue, gone, reading):
+        """Run on a worker thread: call the WSGI app and forward its output."""
+        if reading:
+            with live_scoring.deferring_rebuilds(self._schedule_rebuild):
+                return self._call(environ, loop, queue, gone)
+        return self._call(environ, loop, queue, gone)
+
+    def _call(self, environ, loop, queue, gone):
+        def put(item):
+            # Waits while the queue is full; False once the client is gone
+            if gone.is_set():
+                return False
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+            return True
+
+        headers_sent = []
+
+        def send_headers():
+            if headers_sent and headers_sent[0] is not None:
+                put(("start", headers_sent[0]))
+                headers_sent[0] = None
+
+        def write(data):
+            # The legacy WSGI write() callable, for apps that push output
+            send_headers()
+            if data:
+                put(("body", bytes(data)))
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and headers_sent:
+                raise exc_info[1].with_traceback(exc_info[2])
+            headers_sent[:] = [(int(status.split(" ", 1)[0]),
+                                [(k.lower().encode("latin-1"), v.encode("latin-1"))
+                                 for k, v in response_headers])]
+            return write
+
+        result = None
+        try:
+            result = self.wsgi_app(environ, start_response)
+            for chunk in result:
+                send_headers()
+                if chunk and not put(("body", chunk)):
+                    return
+            send_headers()
+            put(("end", None))
+        except Exception as e:
+            print(f"[ERROR] {environ['REQUEST_METHOD']} {environ['PATH_INFO']}: {e}", file=sys.stderr)
+            put(("error", None))
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+
+async def _plain(send, status, body):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _event(send, text):
+    await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+application = WSGIBridge(flask_app)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        print("[ERROR] uvicorn is not installed: pip install uvicorn")
+        sys.exit(1)
+    print("[INFO] Starting Fantasy Cricket ASGI server")
+    print(f"[INFO] Database: {db.DB_FILE}")
+    print(f"[INFO] {READ_WORKERS} read workers, {WRITE_WORKERS} write workers")
+    print("[INFO] Running on http://localhost:5000")
+    uvicorn.run(application, host="0.0.0.0", port=5000, log_level="warning")
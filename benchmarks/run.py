@@ -0,0 +1,159 @@
+"""Benchmark scoring_engine and the Flask API hot paths on synthetic data.
+
+    python benchmarks/run.py --scale 1000
+    python benchmarks/run.py --scale 100000 --matches 3 --output after.json --compare before.json
+
+Each run builds a throwaway database, times the hot paths and writes
+throughput and p50/p99 latency per benchmark to JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import CATEGORIES, player_name, populate  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(name, func, iterations, warmup=3):
+    """Call func(i) `iterations` times and summarize latencies in ms."""
+    for i in range(min(warmup, iterations)):
+        func(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        'iterations': iterations,
+        'total_s': round(elapsed, 4),
+        'ops_per_s': round(iterations / elapsed, 2) if elapsed else None,
+        'mean_ms': round(statistics.fmean(latencies), 4),
+        'p50_ms': round(percentile(latencies, 50), 4),
+        'p99_ms': round(percentile(latencies, 99), 4),
+    }
+    print(f"  {name:<24} {result['ops_per_s']:>12,.1f} ops/s   "
+          f"p50 {result['p50_ms']:>9.3f} ms   p99 {result['p99_ms']:>9.3f} ms")
+    return result
+
+
+def expect_ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def run(scale, matches, teams, iterations, seed):
+    workdir = tempfile.mkdtemp(prefix="fc-bench-")
+    db_file = os.path.join(workdir, "bench.db")
+    # Must be set before db.py is imported
+    os.environ["FANTASY_CRICKET_DB"] = db_file
+
+    print(f"[INFO] Generating {scale} players x {matches} matches, {teams} teams in {db_file}")
+    t0 = time.perf_counter()
+    populate(db_file, scale, matches, teams, seed)
+    setup_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    import app as app_module
+    from scoring_engine import calculate_score
+    import projection
+    startup_s = time.perf_counter() - t0
+
+    client = app_module.app.test_client()
+    rng = random.Random(seed)
+    names = [player_name(rng.randrange(scale)) for _ in range(iterations)]
+    team_names = [f"Team {rng.randrange(teams):07d}" for _ in range(iterations)] if teams else []
+    # Players worth <= 9 keep any random XI under the 100-point cap
+    cheap = {}
+    for i in range(min(scale, 5000)):
+        if app_module.get_player_value(player_name(i)) <= 9:
+            cheap.setdefault(CATEGORIES[i % 4], []).append(player_name(i))
+
+    def random_xi():
+        """3 BAT, 3 BWL, 3 AR and 2 WK: meets every role minimum."""
+        counts = {'BAT': 3, 'BWL': 3, 'AR': 3, 'WK': 2}
+        return [p for ctg, n in counts.items() for p in rng.sample(cheap[ctg], n)]
+
+    print(f"[INFO] Setup {setup_s:.2f}s, app import {startup_s:.2f}s\n")
+    results = {}
+    results['calculate_score'] = measure('calculate_score', lambda i: calculate_score(names[i]), iterations)
+    results['get_player_value'] = measure('get_player_value',
+                                          lambda i: app_module.get_player_value(names[i]), iterations)
+    results['save_team'] = measure('POST /api/team/save', lambda i: expect_ok(client.post(
+        '/api/team/save', json={'team_name': f"Bench {i}", 'players': random_xi()})), iterations)
+    if team_names:
+        results['evaluate_team_score'] = measure('GET /api/team/score', lambda i: expect_ok(
+            client.get(f'/api/team/score/{team_names[i]}')), iterations)
+    # 100k simulations per call; fewer iterations keep the run short
+    lineups = [random_xi() for _ in range(min(iterations, 50))]
+    results['project_team'] = measure('projection.project x100k', lambda i: projection.project(
+        lineups[i], 100000), len(lineups))
+    results['get_teams'] = measure('GET /api/teams', lambda i: expect_ok(client.get('/api/teams')), iterations)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': {'players': scale, 'matches': matches, 'teams': teams,
+                  'iterations': iterations, 'seed': seed},
+        'setup_s': round(setup_s, 3),
+        'startup_s': round(startup_s, 3),
+        'results': results,
+    }
+
+
+def compare(current, baseline_file):
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_file} ({baseline['timestamp']}):")
+    for name, result in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old.get('p50_ms'):
+            continue
+        speedup = old['p50_ms'] / result['p50_ms'] if result['p50_ms'] else float('inf')
+        print(f"  {name:<24} p50 {old['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms  ({speedup:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Fantasy Cricket hot paths.")
+    parser.add_argument("--scale", type=int, default=1000, help="players in the pool (10^3 - 10^6)")
+    parser.add_argument("--matches", type=int, default=1, help="match rows per player")
+    parser.add_argument("--teams", type=int, help="saved teams (defaults to --scale)")
+    parser.add_argument("--iterations", type=int, default=500, help="calls per benchmark")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    teams = args.scale if args.teams is None else args.teams
+    report = run(args.scale, args.matches, teams, args.iterations, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[SUCCESS] Results written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
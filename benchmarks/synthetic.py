@@ -0,0 +1,64 @@
+"""Synthetic stats/match/teams data for benchmarks."""
+import random
+import sqlite3
+
+CATEGORIES = ["BAT", "BWL", "WK", "AR"]
+TEAM_SIZE = 11
+
+
+def player_name(i):
+    return f"Player {i:07d}"
+
+
+def populate(db_file, players, matches, teams, seed=2026):
+    """Create a fresh database with `players` stats rows, `matches` match
+    rows per player (`players` x `matches` in all) and `teams` saved XIs
+    drawn from the pool."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("PRAGMA synchronous=OFF")
+
+    c.execute('''CREATE TABLE stats
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  player TEXT UNIQUE,
+                  ctg TEXT,
+                  value INTEGER,
+                  runs INTEGER DEFAULT 0,
+                  wickets INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE teams
+                 (name TEXT PRIMARY KEY,
+                  points_used INTEGER,
+                  created_at TEXT)''')
+
+    # Imported late so FANTASY_CRICKET_DB can point at db_file first
+    from schema import ensure_schema
+    ensure_schema(conn)
+
+    c.executemany("INSERT INTO stats (player, ctg, value) VALUES (?,?,?)",
+                  ((player_name(i), CATEGORIES[i % 4], rng.randint(6, 10)) for i in range(players)))
+
+    def match_rows():
+        for match_id in range(1, matches + 1):
+            for i in range(players):
+                yield (match_id, player_name(i), rng.randrange(120), rng.randrange(1, 80),
+                       rng.randrange(12), rng.randrange(8), rng.randrange(25), rng.randrange(2),
+                       rng.randrange(60), rng.randrange(6), rng.randrange(3), rng.randrange(2),
+                       rng.randrange(2))
+
+    c.executemany("INSERT INTO match VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", match_rows())
+
+    def team_rows():
+        for t in range(teams):
+            yield f"Team {t:07d}", 0, "2026-01-01T00:00:00"
+
+    def slot_rows():
+        for t in range(teams):
+            for slot, pid in enumerate(rng.sample(range(1, players + 1), min(TEAM_SIZE, players))):
+                yield f"Team {t:07d}", pid, slot
+
+    c.executemany("INSERT INTO teams (name, points_used, created_at) VALUES (?,?,?)", team_rows())
+    c.executemany("INSERT INTO team_players (team_name, player_id, slot) VALUES (?,?,?)", slot_rows())
+    conn.commit()
+    conn.close()
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from db import CHECK_INTERVAL, Lazy, connection
+from player_search import DEFAULT_LIMIT, PlayerSearchIndex
+from schema import get_version
+
+PlayerInfo = namedtuple("PlayerInfo", ["name", "ctg", "value", "runs", "wickets"])
+
+
+def _to_int(value):
+    """Safe int conversion, matching the old get_player_value behaviour."""
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        try:
+            return int(float(value))
+        except (ValueError, TypeError):
+            return 0
+
+
+class PlayerCatalogue:
+    """In-memory copy of the `stats` table.
+
+    Reads come from memory. At most once every CHECK_INTERVAL seconds a read
+    looks at the `stats_version` counter and rebuilds if it moved. The search
+    index is built with the first load; after a reload a background thread
+    rebuilds it while searches keep using the previous one.
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.version = None
+        self.loaded_at = None
+        self._by_name = {}
+        self._by_category = {}
+        self._search = (None, None)    # (the _by_name it indexes, PlayerSearchIndex)
+        self._indexer = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, conn, version):
+        rows = conn.execute("SELECT player, ctg, value, runs, wickets FROM stats").fetchall()
+        by_name = {}
+        by_category = {}
+        for player, ctg, value, runs, wickets in rows:
+            info = PlayerInfo(player, ctg, _to_int(value),
+                              _to_int(runs) if runs else 0,
+                              _to_int(wickets) if wickets else 0)
+            by_name[player] = info
+            by_category.setdefault(ctg, []).append(player)
+        for names in by_category.values():
+            names.sort()
+        # Swap whole dicts so readers never see a half-built catalogue
+        self._by_name, self._by_category = by_name, by_category
+        self.version = version
+        self.loaded_at = datetime.now(timezone.utc)
+        if self._search[1] is None:
+            self._search = (by_name, PlayerSearchIndex(by_name))
+        elif self._indexer is None:
+            self._indexer = threading.Thread(target=self._reindex, name="player-index", daemon=True)
+            self._indexer.start()
+
+    def _reindex(self):
+        """Index the latest _by_name until one indexed is still current."""
+        while True:
+            by_name = self._by_name
+            index = PlayerSearchIndex(by_name)
+            with self._lock:
+                self._search = (by_name, index)
+                if self._by_name is by_name:
+                    self._indexer = None
+                    return
+
+    def refresh(self, force=False):
+        """Rebuild from SQLite if the stats version changed (or if forced)."""
+        with self._lock:
+            with connection() as conn:
+                version = get_version(conn, "stats_version")
+                if force or version != self.version:
+                    self._load(conn, version)
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next read to re-check the stats version."""
+        self._checked_at = 0.0
+
+    def _maybe_refresh(self):
+        if self.version is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+
+    def current(self):
+        """(version, loaded_at) of the data reads will see."""
+        self._maybe_refresh()
+        return self.version, self.loaded_at
+
+    def players(self, category):
+        """Sorted player names in a category."""
+        self._maybe_refresh()
+        return list(self._by_category.get(category, []))
+
+    def get(self, name):
+        """PlayerInfo for a name, or None."""
+        self._maybe_refresh()
+        return self._by_name.get(name)
+
+    def all_players(self):
+        """Every PlayerInfo, in no particular order."""
+        self._maybe_refresh()
+        return list(self._by_name.values())
+
+    def details(self, category=None, names=None):
+        """PlayerInfo list for a category and/or explicit names, plus the
+        (version, loaded_at) it was read from."""
+        self._maybe_refresh()
+        by_name, by_category = self._by_name, self._by_category
+        version, loaded_at = self.version, self.loaded_at
+        wanted = []
+        if category is not None:
+            wanted.extend(by_category.get(category, []))
+        if names:
+            wanted.extend(names)
+        players = [by_name[name] for name in dict.fromkeys(wanted) if name in by_name]
+        return players, version, loaded_at
+
+    def search(self, query, limit=DEFAULT_LIMIT, category=None):
+        """Best PlayerInfo matches for a partial or misspelt name.
+
+        Just after a reload the index may still be the previous one: names
+        added since are not found yet, and names removed since are skipped.
+        """
+        self._maybe_refresh()
+        by_name = self._by_name
+        _, index = self._search
+        if category is None:
+            accept = lambda i: index.names[i] in by_name
+        else:
+            accept = lambda i: getattr(by_name.get(index.names[i]), "ctg", None) == category
+        return [by_name[name] for name in index.search(query, limit, accept)]
+
+    def value(self, name):
+        """Player value, 0 when unknown."""
+        info = self.get(name)
+        return info.value if info else 0
+
+
+def _load_catalogue():
+    catalogue = PlayerCatalogue()
+    catalogue.refresh()
+    return catalogue
+
+
+_catalogue = Lazy(_load_catalogue)
+
+
+def get_catalogue():
+    """Return the process-wide catalogue, loading it on first use."""
+    return _catalogue.get()
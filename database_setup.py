@@ -3,11 +3,14 @@ import sqlite3
 import os
 import sys
 
+from db import DB_FILE
+from schema import ensure_schema
+
 # Fix encoding for Windows
 if sys.platform == 'win32':
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-db_file = "fantasy_cricket.db"
+db_file = DB_FILE
 
 print("Starting database setup...\n")
 
@@ -18,6 +21,12 @@ try:
     # Drop old tables
     c.execute("DROP TABLE IF EXISTS stats")
     c.execute("DROP TABLE IF EXISTS teams")
+    c.execute("DROP TABLE IF EXISTS team_players")
+    # Scores derived from the old teams and players
+    c.execute("DROP TABLE IF EXISTS player_points")
+    c.execute("DROP TABLE IF EXISTS team_totals")
+    c.execute("DROP TABLE IF EXISTS team_match_scores")
+    c.execute("DROP TABLE IF EXISTS leaderboard_snapshot")
     print("[INFO] Dropped old tables\n")
     
     # Create stats table (6 columns)
@@ -32,9 +41,15 @@ try:
     # Create teams table
     c.execute('''CREATE TABLE teams
                  (name TEXT PRIMARY KEY,
-                  players TEXT,
-                  points_used INTEGER)''')
+                  points_used INTEGER,
+                  created_at TEXT)''')
     
+    # Also creates (or migrates) the keyed, indexed match table. Match data
+    # is kept across reseeds since it references players by name.
+    ensure_schema(conn)
+    # Make running apps rebuild totals and reload the leaderboard
+    c.execute("DELETE FROM meta WHERE key IN ('totals_version', 'totals_rules')")
+    c.execute("UPDATE meta SET value = value + 1 WHERE key = 'team_totals_version'")
     conn.commit()
     print("[SUCCESS] Tables created\n")
     
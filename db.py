@@ -0,0 +1,152 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_FILE = os.environ.get("FANTASY_CRICKET_DB", "fantasy_cricket.db")
+
+POOL_SIZE = int(os.environ.get("FANTASY_CRICKET_DB_POOL", "8"))
+POOL_TIMEOUT = 10          # seconds to wait for a free connection
+BUSY_TIMEOUT_MS = 5000     # how long a writer waits on the SQLite lock
+STATEMENT_CACHE = 256      # prepared statements kept per connection
+
+# How often in-memory state built from the database or from files
+# (catalogue, leaderboard, scoring rules, snapshot) re-checks its source
+CHECK_INTERVAL = 2.0
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up in time."""
+
+
+class ConnectionPool:
+    """Bounded, thread-aware pool of SQLite connections.
+
+    A thread that already holds a connection gets the same one back on
+    nested use, so helpers can call each other without taking extra slots.
+    """
+
+    def __init__(self, db_file=DB_FILE, size=POOL_SIZE, factory=sqlite3.Connection):
+        self.db_file = db_file
+        self.size = size
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE,
+                               factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise PoolTimeout(f"No database connection free after {POOL_TIMEOUT}s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def _checkin(self, conn):
+        self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commit on success, roll back on error."""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    def close(self):
+        """Close every connection the pool has opened."""
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+        self._idle = queue.LifoQueue()
+
+
+def begin_write(conn):
+    """Take the write lock now, unless a transaction is already open, so
+    the reads that decide a write see what the write commits over."""
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+class Lazy:
+    """A process-wide object made by factory() on first get(), once, even
+    when several threads ask at the same time."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        value = self._value
+        if value is None:
+            with self._lock:
+                value = self._value
+                if value is None:
+                    value = self._value = self._factory()
+        return value
+
+    def set(self, value):
+        """Use `value` instead of the factory's; False if one already exists."""
+        with self._lock:
+            if self._value is not None:
+                return False
+            self._value = value
+            return True
+
+
+_pool = Lazy(ConnectionPool)
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    return _pool.get()
+
+
+def configure_pool(size):
+    """Size the process-wide pool; must run before anything connects."""
+    pool = ConnectionPool(size=size)
+    if not _pool.set(pool):
+        raise RuntimeError("Connection pool already in use")
+    return pool
+
+
+def connection():
+    """Shortcut for get_pool().connection()."""
+    return get_pool().connection()
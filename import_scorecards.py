@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Bulk-load match scorecards from CSV or JSONL into the match table.
+
+    python import_scorecards.py season.csv
+    python import_scorecards.py season.jsonl --chunk-size 20000
+
+Each record needs match_id and player; missing stat columns count as 0.
+Rows are upserted on (match_id, player), so re-running a file is safe.
+Progress is checkpointed after every committed chunk in <file>.checkpoint
+and an interrupted import resumes from there (use --restart to ignore it).
+
+Each chunk is one write transaction that bumps match_version once,
+rather than once per row through the match triggers. Rows naming a
+player missing from stats are rejected.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from db import begin_write, connection
+from schema import MATCH_STAT_COLUMNS, ensure_schema
+
+CHUNK_SIZE = 10000
+MAX_REPORTED_ERRORS = 20
+
+COLUMNS = ("match_id", "player") + MATCH_STAT_COLUMNS
+
+UPSERT = (f"INSERT INTO match ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+          f"ON CONFLICT (match_id, player) DO UPDATE SET "
+          + ", ".join(f"{col}=excluded.{col}" for col in MATCH_STAT_COLUMNS))
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def read_lines(path, offset=0, line_no=0):
+    """Yield (line_no, end_offset, text) from a byte offset onwards."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in iter(f.readline, b""):
+            line_no += 1
+            yield line_no, f.tell(), raw.decode("utf-8-sig" if line_no == 1 else "utf-8")
+
+
+def read_csv(path, offset=0, line_no=0):
+    """Yield (line_no, end_offset, values) per CSV record from a byte
+    offset onwards. Quoted fields may span lines; line_no is the record's
+    last line."""
+    end = offset
+    def lines():
+        nonlocal end
+        for _, end, text in read_lines(path, offset, line_no):
+            yield text
+    reader = csv.reader(lines())
+    for values in reader:
+        yield line_no + reader.line_num, end, values
+
+
+def parse_records(lines, fmt, header):
+    """Turn JSONL lines or CSV values into (line_no, end_offset, dict) records."""
+    for line_no, end, item in lines:
+        if fmt == "jsonl":
+            if not item.strip():
+                continue
+            try:
+                record = json.loads(item)
+            except json.JSONDecodeError as e:
+                yield line_no, end, InvalidRow(f"bad JSON: {e.msg}")
+                continue
+            if not isinstance(record, dict):
+                yield line_no, end, InvalidRow("record is not an object")
+                continue
+            yield line_no, end, record
+        elif any(value.strip() for value in item):
+            yield line_no, end, dict(zip(header, item))
+
+
+def validate(records, known):
+    """Turn records into match tuples, or InvalidRow errors. `known` is
+    the set of player names in stats."""
+    for line_no, end, record in records:
+        if isinstance(record, InvalidRow):
+            yield line_no, end, record
+            continue
+        try:
+            player = str(record.get("player") or "").strip()
+            if not player:
+                raise InvalidRow("player is required")
+            if player not in known:
+                raise InvalidRow(f"unknown player: {player!r}")
+            values = [_count(record.get("match_id"), "match_id", allow_missing=False)]
+            values.append(player)
+            values.extend(_count(record.get(col), col) for col in MATCH_STAT_COLUMNS)
+            if values[0] < 1:
+                raise InvalidRow("match_id must be positive")
+            yield line_no, end, tuple(values)
+        except InvalidRow as e:
+            yield line_no, end, e
+
+
+def _count(value, column, allow_missing=True):
+    if value is None or value == "":
+        if allow_missing:
+            return 0
+        raise InvalidRow(f"{column} is required")
+    try:
+        number = int(value)
+    except (ValueError, TypeError):
+        raise InvalidRow(f"{column} is not an integer: {value!r}")
+    if number < 0:
+        raise InvalidRow(f"{column} is negative: {number}")
+    return number
+
+
+def chunked(rows, size):
+    """Group validated rows into (rows, errors, last_line, end_offset) batches."""
+    batch, errors = [], []
+    for line_no, end, row in rows:
+        if isinstance(row, InvalidRow):
+            errors.append((line_no, str(row)))
+        else:
+            batch.append(row)
+        if len(batch) >= size:
+            yield batch, errors, line_no, end
+            batch, errors = [], []
+    if batch or errors:
+        yield batch, errors, line_no, end
+
+
+def load_checkpoint(path):
+    """Resume state for `path`, or None if it has none or the file changed."""
+    try:
+        with open(path + ".checkpoint") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(path)
+    if state.get("size") != stat.st_size or state.get("mtime") != stat.st_mtime:
+        return None
+    return state
+
+
+def save_checkpoint(path, state):
+    tmp = path + ".checkpoint.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path + ".checkpoint")
+
+
+def import_file(path, fmt=None, chunk_size=CHUNK_SIZE, restart=False, strict=False):
+    """Stream `path` into match. Returns (rows_loaded, rows_rejected)."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    stat = os.stat(path)
+
+    state = None if restart else load_checkpoint(path)
+    if state is None:
+        state = {"size": stat.st_size, "mtime": stat.st_mtime, "offset": 0,
+                 "line": 0, "loaded": 0, "rejected": 0, "header": None}
+    else:
+        print(f"[INFO] Resuming {path} at line {state['line']} ({state['loaded']} rows already loaded)")
+
+    if fmt == "csv":
+        lines = read_csv(path, state["offset"], state["line"])
+    else:
+        lines = read_lines(path, state["offset"], state["line"])
+    if fmt == "csv" and state["header"] is None:
+        first = next(lines, None)
+        if first is None:
+            return 0, 0
+        state["line"], state["offset"], header = first
+        state["header"] = [h.strip() for h in header]
+        missing = {"match_id", "player"} - set(state["header"])
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+
+    started, resumed_at = time.perf_counter(), state["loaded"]
+    with connection() as conn:
+        ensure_schema(conn)
+        known = {player for (player,) in conn.execute("SELECT player FROM stats")}
+        rows = validate(parse_records(lines, fmt, state["header"]), known)
+        for batch, errors, line_no, end in chunked(rows, chunk_size):
+            for error_line, message in errors[:max(0, MAX_REPORTED_ERRORS - state["rejected"])]:
+                print(f"[WARNING] Line {error_line}: {message}")
+            if errors and strict:
+                raise ValueError(f"Line {errors[0][0]}: {errors[0][1]}")
+
+            # The paused row only exists inside this transaction, so other
+            # connections' writes keep bumping match_version as usual
+            begin_write(conn)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('match_version_paused', 1)")
+            conn.executemany(UPSERT, batch)
+            conn.execute("DELETE FROM meta WHERE key = 'match_version_paused'")
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'match_version'")
+            conn.commit()
+
+            state["loaded"] += len(batch)
+            state["rejected"] += len(errors)
+            state["offset"], state["line"] = end, line_no
+            save_checkpoint(path, state)
+            rate = (state["loaded"] - resumed_at) / max(time.perf_counter() - started, 1e-9)
+            print(f"[INFO] {state['loaded']} rows loaded ({rate:,.0f} rows/s)")
+
+    if os.path.exists(path + ".checkpoint"):
+        os.remove(path + ".checkpoint")
+    return state["loaded"], state["rejected"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load scorecards into the match table.")
+    parser.add_argument("path", help="CSV or JSONL scorecard file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per transaction")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--strict", action="store_true", help="stop at the first invalid row")
+    args = parser.parse_args(argv)
+
+    print(f"Importing scorecards from {args.path}...\n")
+    started = time.perf_counter()
+    try:
+        loaded, rejected = import_file(args.path, args.format, args.chunk_size, args.restart, args.strict)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    print(f"\n[SUCCESS] Imported {loaded} rows, rejected {rejected}, "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
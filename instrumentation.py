@@ -0,0 +1,323 @@
+"""Opt-in request metrics and profiling for the Flask app.
+
+Set FANTASY_CRICKET_INSTRUMENT=1 to:
+  * count and time every SQL statement, per request and per endpoint
+  * time functions decorated with @timed (calculate_score, get_player_value, ...)
+  * add a Server-Timing header to each response
+  * serve Prometheus text metrics at /metrics
+
+Additionally set FANTASY_CRICKET_PROFILE_RATE (e.g. 0.01) to run that
+fraction of requests under cProfile. Each sampled request is dumped as a
+.prof file to FANTASY_CRICKET_PROFILE_DIR, and stack samples are folded
+into stacks.folded there (input for flamegraph.pl or speedscope).
+
+With the flag unset, @timed returns functions unchanged and nothing is
+installed, so there is no overhead.
+"""
+import cProfile
+import functools
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+
+ENABLED = os.environ.get("FANTASY_CRICKET_INSTRUMENT") == "1"
+PROFILE_RATE = float(os.environ.get("FANTASY_CRICKET_PROFILE_RATE", "0"))
+PROFILE_DIR = os.environ.get("FANTASY_CRICKET_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = 0.001   # seconds between stack samples
+
+REQUEST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Per-request accumulator; lives on the handling thread."""
+    __slots__ = ("sql_count", "sql_seconds", "calls")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.calls = defaultdict(lambda: [0, 0.0])
+
+
+_collectors = []
+
+
+def register_collector(collect):
+    """Add extra samples to /metrics.
+
+    `collect()` returns (name, type, help, value) tuples and is called on
+    every scrape; registering costs nothing when instrumentation is off.
+    """
+    _collectors.append(collect)
+
+
+class Metrics:
+    """Process-wide counters rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)            # (endpoint, method, status)
+        self.request_seconds = defaultdict(float)   # endpoint
+        self.request_buckets = defaultdict(lambda: [0] * (len(REQUEST_BUCKETS) + 1))
+        self.sql_statements = defaultdict(int)      # (endpoint, verb)
+        self.sql_seconds = defaultdict(float)       # (endpoint, verb)
+        self.calls = defaultdict(int)               # function
+        self.call_seconds = defaultdict(float)      # function
+
+    def record_sql(self, endpoint, verb, seconds, statements):
+        with self._lock:
+            self.sql_statements[endpoint, verb] += statements
+            self.sql_seconds[endpoint, verb] += seconds
+
+    def record_call(self, name, seconds):
+        with self._lock:
+            self.calls[name] += 1
+            self.call_seconds[name] += seconds
+
+    def record_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            self.requests[endpoint, method, status] += 1
+            self.request_seconds[endpoint] += seconds
+            buckets = self.request_buckets[endpoint]
+            for i, bound in enumerate(REQUEST_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            buckets[-1] += 1
+
+    def render(self):
+        def labels(**kv):
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in kv.items()) + "}"
+
+        lines = []
+        with self._lock:
+            lines += ["# HELP fantasy_requests_total HTTP requests handled.",
+                      "# TYPE fantasy_requests_total counter"]
+            for (endpoint, method, status), n in sorted(self.requests.items()):
+                lines.append(f"fantasy_requests_total{labels(endpoint=endpoint, method=method, status=status)} {n}")
+
+            lines += ["# HELP fantasy_request_seconds Request latency.",
+                      "# TYPE fantasy_request_seconds histogram"]
+            for endpoint, buckets in sorted(self.request_buckets.items()):
+                for bound, n in zip(REQUEST_BUCKETS, buckets):
+                    lines.append(f"fantasy_request_seconds_bucket{labels(endpoint=endpoint, le=bound)} {n}")
+                lines.append(f"fantasy_request_seconds_bucket{labels(endpoint=endpoint, le='+Inf')} {buckets[-1]}")
+                lines.append(f"fantasy_request_seconds_sum{labels(endpoint=endpoint)} "
+                             f"{self.request_seconds[endpoint]:.6f}")
+                lines.append(f"fantasy_request_seconds_count{labels(endpoint=endpoint)} {buckets[-1]}")
+
+            lines += ["# HELP fantasy_sql_statements_total SQL statements executed.",
+                      "# TYPE fantasy_sql_statements_total counter"]
+            for (endpoint, verb), n in sorted(self.sql_statements.items()):
+                lines.append(f"fantasy_sql_statements_total{labels(endpoint=endpoint, verb=verb)} {n}")
+            lines += ["# HELP fantasy_sql_seconds_total Time spent in SQLite (execute and fetch).",
+                      "# TYPE fantasy_sql_seconds_total counter"]
+            for (endpoint, verb), seconds in sorted(self.sql_seconds.items()):
+                lines.append(f"fantasy_sql_seconds_total{labels(endpoint=endpoint, verb=verb)} {seconds:.6f}")
+
+            lines += ["# HELP fantasy_function_calls_total Calls to instrumented functions.",
+                      "# TYPE fantasy_function_calls_total counter"]
+            for name, n in sorted(self.calls.items()):
+                lines.append(f"fantasy_function_calls_total{labels(function=name)} {n}")
+            lines += ["# HELP fantasy_function_seconds_total Time inside instrumented functions.",
+                      "# TYPE fantasy_function_seconds_total counter"]
+            for name, seconds in sorted(self.call_seconds.items()):
+                lines.append(f"fantasy_function_seconds_total{labels(function=name)} {seconds:.6f}")
+
+        for collect in _collectors:
+            for name, kind, help_text, value in collect():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _endpoint():
+    return getattr(_local, "endpoint", None) or "<none>"
+
+
+def _record_sql(sql, seconds, statements=1):
+    verb = sql.lstrip().split(None, 1)[0].upper() if sql and sql.strip() else "?"
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.sql_count += statements
+        stats.sql_seconds += seconds
+    metrics.record_sql(_endpoint(), verb, seconds, statements)
+
+
+def timed(name):
+    """Attribute time spent in the decorated function to `name`."""
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - started
+                stats = getattr(_local, "stats", None)
+                if stats is not None:
+                    entry = stats.calls[name]
+                    entry[0] += 1
+                    entry[1] += seconds
+                metrics.record_call(name, seconds)
+        return wrapper
+    return decorator
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execution and fetching."""
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(sql, time.perf_counter() - started)
+
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            _record_sql(getattr(self, "_sql", ""), time.perf_counter() - started, statements=0)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose shortcuts go through InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of profiled request threads into folded counts."""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.active = set()
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for ident in list(self.active):
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    if stack:
+                        self.counts[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with self._lock:
+            lines = [f"{stack} {n}" for stack, n in self.counts.items()]
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def install(app):
+    """Wire metrics, Server-Timing and optional profiling into a Flask app.
+
+    Call before the app opens any pooled connection.
+    """
+    if not ENABLED:
+        return
+
+    from flask import Response, g, request
+
+    import db
+
+    pool = db.get_pool()
+    pool.close()
+    pool.factory = InstrumentedConnection
+
+    sampler = None
+    if PROFILE_RATE > 0:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        sampler = StackSampler()
+        sampler.start()
+
+    @app.before_request
+    def _start_request():
+        _local.stats = RequestStats()
+        _local.endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+        g._instrument_started = time.perf_counter()
+        g._profiler = None
+        if sampler is not None and random.random() < PROFILE_RATE:
+            g._profiler = cProfile.Profile()
+            sampler.active.add(threading.get_ident())
+            g._profiler.enable()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.get("_instrument_started")
+        stats = getattr(_local, "stats", None)
+        if started is None or stats is None:
+            return response
+        seconds = time.perf_counter() - started
+
+        profiler = g.get("_profiler")
+        if profiler is not None:
+            profiler.disable()
+            sampler.active.discard(threading.get_ident())
+            name = re.sub(r"[^A-Za-z0-9_.-]+", "_", _local.endpoint).strip("_") or "index"
+            profiler.dump_stats(os.path.join(PROFILE_DIR, f"{time.time():.6f}-{name}.prof"))
+            sampler.dump(os.path.join(PROFILE_DIR, "stacks.folded"))
+
+        parts = [f'db;dur={stats.sql_seconds * 1000:.3f};desc="{stats.sql_count} queries"']
+        for name, (count, call_seconds) in stats.calls.items():
+            parts.append(f'{name};dur={call_seconds * 1000:.3f};desc="{count} calls"')
+        parts.append(f"total;dur={seconds * 1000:.3f}")
+        response.headers["Server-Timing"] = ", ".join(parts)
+
+        metrics.record_request(_local.endpoint, request.method, response.status_code, seconds)
+        _local.stats = None
+        _local.endpoint = None
+        return response
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        """Prometheus text-format metrics"""
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,260 @@
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import live_scoring
+from db import CHECK_INTERVAL, Lazy, connection
+from schema import get_version
+
+VERSION_KEY = "team_totals_version"
+
+# Enough levels for ~16M teams at p=1/2
+MAX_LEVELS = 24
+
+_END = (math.inf,)
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [0] * levels
+
+
+class IndexableSkipList:
+    """Sorted keys with O(log n) insert, remove, rank and select.
+
+    Each link stores how many positions it skips, so walking down the
+    levels accumulates an index as well as finding a key.
+    """
+
+    def __init__(self):
+        self._tail = _Node(_END, 0)
+        self._head = _Node(None, MAX_LEVELS)
+        self._head.next = [self._tail] * MAX_LEVELS
+        self._head.width = [1] * MAX_LEVELS
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, key):
+        chain = [None] * MAX_LEVELS
+        steps = [0] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = min(MAX_LEVELS, 1 - int(math.log(1.0 - random.random(), 2.0)))
+        new = _Node(key, levels)
+        skipped = 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - skipped
+            prev.width[level] = skipped + 1
+            skipped += steps[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain = [None] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key):
+        """0-based position of key; raises KeyError if absent."""
+        position = 0
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def islice(self, start, stop):
+        """Yield keys at positions start..stop-1."""
+        if start >= self._size or stop <= start:
+            return
+        remaining = start + 1
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        for _ in range(min(stop, self._size) - start):
+            yield node.key
+            node = node.next[0]
+
+
+class Leaderboard:
+    """Team totals ranked in memory, fed from team_totals.
+
+    In-process writers report the teams they touched (see `tracking`), so
+    updates cost O(changed teams x log n). Writes from anywhere else show
+    up as a version mismatch and are diffed in on the next read.
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.version = None
+        self._scores = {}
+        self._ranking = IndexableSkipList()
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._changes = {}
+
+    def add_listener(self, listener):
+        """Call `listener({team_name: total or None})` after every update
+        with the teams whose totals changed (None means removed)."""
+        self._listeners.append(listener)
+
+    def _publish(self):
+        changes, self._changes = self._changes, {}
+        if changes:
+            for listener in self._listeners:
+                listener(changes)
+
+    def _set(self, team_name, total):
+        old = self._scores.get(team_name)
+        if old == total:
+            return
+        if self._listeners:
+            self._changes[team_name] = total
+        if old is not None:
+            self._ranking.remove((-old, team_name))
+        if total is None:
+            del self._scores[team_name]
+        else:
+            self._scores[team_name] = total
+            self._ranking.insert((-total, team_name))
+
+    def _reload(self, conn):
+        # Only teams that still exist, whatever team_totals has left behind
+        current = dict(conn.execute("SELECT tt.team_name, tt.total_score FROM team_totals tt "
+                                    "JOIN teams t ON t.name = tt.team_name").fetchall())
+        for team_name in [t for t in self._scores if t not in current]:
+            self._set(team_name, None)
+        for team_name, total in current.items():
+            self._set(team_name, total)
+        self.version = get_version(conn, VERSION_KEY)
+        self._publish()
+
+    def sync(self, force=False):
+        """Pull in changes made outside this process (or reload if forced)."""
+        with connection() as conn:
+            # A rebuild needs SQLite's write lock: take it before _lock, in
+            # the same order as writers using tracking()
+            live_scoring.ensure_totals(conn)
+            with self._lock:
+                if force or get_version(conn, VERSION_KEY) != self.version:
+                    self._reload(conn)
+                self._checked_at = time.monotonic()
+
+    def _maybe_sync(self):
+        if self.version is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.sync()
+
+    @contextmanager
+    def tracking(self, conn):
+        """Collect the names of teams changed inside the block and apply
+        their new totals afterwards, within the caller's transaction.
+
+        The caller should already hold the write lock (begin_write), so
+        _lock is only ever taken after it.
+        """
+        live_scoring.ensure_totals(conn)
+        before = get_version(conn, VERSION_KEY)
+        changed = set()
+        yield changed
+        totals = {}
+        if changed:
+            marks = ",".join("?" * len(changed))
+            totals.update(conn.execute(f"SELECT team_name, total_score FROM team_totals "
+                                       f"WHERE team_name IN ({marks})", list(changed)).fetchall())
+        with self._lock:
+            if self.version != before:
+                self._reload(conn)
+                return
+            for team_name in changed:
+                self._set(team_name, totals.get(team_name))
+            self.version = get_version(conn, VERSION_KEY)
+            self._publish()
+
+    def __len__(self):
+        self._maybe_sync()
+        return len(self._scores)
+
+    def top(self, offset=0, limit=50):
+        """[(rank, team_name, total_score)] for one page, rank 1-based."""
+        self._maybe_sync()
+        with self._lock:
+            return [(offset + i + 1, team_name, -neg_total)
+                    for i, (neg_total, team_name) in enumerate(self._ranking.islice(offset, offset + limit))]
+
+    def totals(self, team_names):
+        """{team_name: total_score} for the named teams that have one."""
+        self._maybe_sync()
+        with self._lock:
+            return {t: self._scores[t] for t in team_names if t in self._scores}
+
+    def rank(self, team_name):
+        """(rank, total_score) for a team, or None if it has no total."""
+        self._maybe_sync()
+        with self._lock:
+            total = self._scores.get(team_name)
+            if total is None:
+                return None
+            return self._ranking.index((-total, team_name)) + 1, total
+
+    def save_snapshot(self, conn):
+        """Persist the current ranking to leaderboard_snapshot."""
+        self._maybe_sync()
+        with self._lock:
+            rows = self.top(0, len(self._scores))
+        taken_at = datetime.now().isoformat()
+        conn.execute("DELETE FROM leaderboard_snapshot")
+        conn.executemany("INSERT INTO leaderboard_snapshot (rank, team_name, total_score, taken_at) "
+                         "VALUES (?,?,?,?)", [row + (taken_at,) for row in rows])
+        return len(rows)
+
+
+def _load_leaderboard():
+    leaderboard = Leaderboard()
+    leaderboard.sync(force=True)
+    return leaderboard
+
+
+_leaderboard = Lazy(_load_leaderboard)
+
+
+def get_leaderboard():
+    """Return the process-wide leaderboard, loading it on first use."""
+    return _leaderboard.get()
@@ -0,0 +1,169 @@
+
+import threading
+from contextlib import contextmanager
+
+from db import begin_write
+from instrumentation import timed
+from schema import MATCH_STAT_COLUMNS, get_version, set_version
+from scoring_engine import MATCH_SELECT
+from scoring_rules import get_rules
+from snapshot import get_snapshot
+from stat_lines import StatBlock
+
+UPSERT_MATCH = (
+    f"INSERT INTO match (match_id, player, {', '.join(MATCH_STAT_COLUMNS)}) "
+    f"VALUES (?, ?, {', '.join('?' * len(MATCH_STAT_COLUMNS))}) "
+    f"ON CONFLICT (match_id, player) DO UPDATE SET "
+    + ", ".join(f"{col}=excluded.{col}" for col in MATCH_STAT_COLUMNS)
+)
+
+# Team totals from player_points; each slot counts, so duplicates add twice
+TEAM_TOTALS_SELECT = """SELECT t.name, COALESCE(SUM(pp.points), 0) FROM teams t
+                        LEFT JOIN team_players tp ON tp.team_name = t.name
+                        LEFT JOIN stats s ON s.id = tp.player_id
+                        LEFT JOIN player_points pp ON pp.player = s.player"""
+
+
+# Per-thread hook set by deferring_rebuilds()
+_local = threading.local()
+
+
+class InvalidDeltaError(ValueError):
+    """Raised for unknown stat names or deltas that would go negative."""
+
+
+def rebuild_totals(conn, rules=None):
+    """Recompute player_points and team_totals from the whole match table."""
+    rules = rules or get_rules()
+    snap = get_snapshot()
+    if snap is not None and snap.is_current(conn):
+        # Same lines, already in columns: skip reading match
+        points = snap.player_totals(rules)
+    else:
+        points = StatBlock.load(conn).player_totals(rules)
+
+    conn.execute("DELETE FROM player_points")
+    conn.executemany("INSERT INTO player_points (player, points) VALUES (?,?)", points.items())
+    conn.execute("DELETE FROM team_totals")
+    conn.execute(f"INSERT INTO team_totals (team_name, total_score) {TEAM_TOTALS_SELECT} GROUP BY t.name")
+    set_version(conn, "totals_version", get_version(conn, "match_version"))
+    set_version(conn, "totals_rules", rules.revision)
+
+
+def _totals_stale(conn, rules):
+    return (get_version(conn, "totals_version") != get_version(conn, "match_version")
+            or get_version(conn, "totals_rules") != rules.revision)
+
+
+def ensure_totals(conn, rules=None):
+    """Rebuild the materialized totals if match changed behind our back,
+    or if they were computed under a different revision of the rules.
+
+    A rebuild takes the write lock (BEGIN IMMEDIATE) on `conn` first, so
+    callers must not hold other locks a writer could be waiting on. Inside
+    deferring_rebuilds() a reader outside any transaction hands the
+    rebuild off instead and reads the last committed totals.
+    """
+    rules = rules or get_rules()
+    if _totals_stale(conn, rules):
+        schedule = getattr(_local, "schedule", None)
+        if schedule is not None and not conn.in_transaction:
+            schedule()
+            return
+        begin_write(conn)
+        # Another writer may have rebuilt while we waited for the lock
+        if _totals_stale(conn, rules):
+            rebuild_totals(conn, rules)
+
+
+@contextmanager
+def deferring_rebuilds(schedule):
+    """Within the block, this thread calls schedule() rather than
+    rebuilding stale totals itself (e.g. to keep read workers off
+    SQLite's write lock)."""
+    previous = getattr(_local, "schedule", None)
+    _local.schedule = schedule
+    try:
+        yield
+    finally:
+        _local.schedule = previous
+
+
+def refresh_team_total(conn, team_name):
+    """Recompute one team's total after its lineup changed."""
+    ensure_totals(conn)
+    conn.execute(f"INSERT OR REPLACE INTO team_totals (team_name, total_score) "
+                 f"{TEAM_TOTALS_SELECT} WHERE t.name=? GROUP BY t.name", (team_name,))
+
+
+@timed('player_points')
+def player_points(conn, players):
+    """Materialized season points for some players (0 when never scored)."""
+    ensure_totals(conn)
+    names = list(dict.fromkeys(players))
+    if not names:
+        return {}
+    marks = ",".join("?" * len(names))
+    points = dict.fromkeys(names, 0)
+    points.update(conn.execute(f"SELECT player, points FROM player_points WHERE player IN ({marks})",
+                               names).fetchall())
+    return points
+
+
+def team_total(conn, team_name):
+    """Materialized total for a team, or None if the team is unknown."""
+    ensure_totals(conn)
+    row = conn.execute("SELECT total_score FROM team_totals WHERE team_name=?", (team_name,)).fetchone()
+    return row[0] if row else None
+
+
+@timed('apply_deltas')
+def apply_deltas(conn, match_id, deltas):
+    """Apply per-player stat deltas for one match and push the point changes
+    to player_points and every team holding those players.
+
+    `deltas` maps player -> {stat column: increment}. Only the touched
+    players are rescored. Returns {player: point change} for players whose
+    points moved. Runs inside the caller's transaction, which it opens
+    with BEGIN IMMEDIATE if need be, so the old lines read are the ones
+    the upserts replace.
+    """
+    begin_write(conn)
+    rules = get_rules()
+    ensure_totals(conn, rules)
+
+    point_deltas = {}
+    for player, changes in deltas.items():
+        unknown = set(changes) - set(MATCH_STAT_COLUMNS)
+        if unknown:
+            raise InvalidDeltaError(f"Unknown stat: {sorted(unknown)[0]}")
+
+        row = conn.execute(MATCH_SELECT + " WHERE player=? AND match_id=?",
+                           (player, match_id)).fetchone()
+        old_line = tuple(row) if row else (player,) + (0,) * len(MATCH_STAT_COLUMNS)
+        new_line = (player,) + tuple(old_line[i + 1] + int(changes.get(col, 0))
+                                     for i, col in enumerate(MATCH_STAT_COLUMNS))
+        if min(new_line[1:]) < 0:
+            raise InvalidDeltaError(f"Delta for {player} makes a stat negative")
+
+        conn.execute(UPSERT_MATCH, (match_id,) + new_line)
+        diff = rules.score_line(new_line) - rules.score_line(old_line)
+        if diff:
+            point_deltas[player] = diff
+
+    for player, diff in point_deltas.items():
+        conn.execute("""INSERT INTO player_points (player, points) VALUES (?,?)
+                        ON CONFLICT (player) DO UPDATE SET points = points + excluded.points""",
+                     (player, diff))
+        row = conn.execute("SELECT id FROM stats WHERE player=?", (player,)).fetchone()
+        if row is None:
+            continue
+        # Only the teams holding this player, found through idx_team_players_player
+        conn.execute("""UPDATE team_totals SET total_score = total_score + ? * (
+                            SELECT COUNT(*) FROM team_players tp
+                            WHERE tp.team_name = team_totals.team_name AND tp.player_id = ?)
+                        WHERE team_name IN (SELECT team_name FROM team_players WHERE player_id = ?)""",
+                     (diff, row[0], row[0]))
+
+    set_version(conn, "totals_version", get_version(conn, "match_version"))
+    return point_deltas
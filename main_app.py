@@ -1,11 +1,15 @@
-import sqlite3
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import *
 from tkinter import messagebox, simpledialog
-from scoring_engine import calculate_score
-
-# Database setup
-conn = sqlite3.connect("fantasy_cricket.db")
-c = conn.cursor()
+from catalogue import get_catalogue
+from db import begin_write, connection
+from schema import ensure_schema
+from scoring_engine import calculate_scores
+import projection
+import team_solver
+import team_validation
+from team_validation import check_lineup
 
 # Create root window
 root = Tk()
@@ -17,76 +21,165 @@ selected_team = []
 team_name = ""
 points_available = 100
 points_used = 0
+player_info = {}      # name -> PlayerInfo, loaded once in the background
 
 # UI Layout
 cat_var = StringVar()
+search_var = StringVar()
 list_players = None
 list_selected = None
 lbl_points = None
+lbl_status = None
+
+# Rows inserted into a Listbox per event-loop turn
+FILL_CHUNK = 500
+# How often the UI picks up finished background work (ms)
+POLL_MS = 30
+# Search after this long without a keystroke (ms), showing this many matches
+SEARCH_DELAY_MS = 150
+SEARCH_LIMIT = 50
+
+# --- BACKGROUND WORK ---
+# Tk may only be touched from the main thread. Database and scoring work
+# runs on one worker thread (so it is serialized, like the old single
+# cursor) and hands its result back through `results`, which the main
+# thread drains every POLL_MS via root.after.
+worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tk-worker")
+results = queue.Queue()
+pending_jobs = 0
+
+def run_in_background(work, on_done, action):
+    """Run work() off the UI thread, then on_done(result) on it.
+    `action` ("save team") labels the status bar and any error."""
+    global pending_jobs
+    pending_jobs += 1
+    set_status(f"{action.capitalize()}...")
+    
+    def job():
+        try:
+            results.put((on_done, work(), None, action))
+        except Exception as e:
+            results.put((on_done, None, e, action))
+    worker.submit(job)
+
+def pump_results():
+    """Deliver finished background work on the UI thread"""
+    global pending_jobs
+    try:
+        while True:
+            on_done, result, error, action = results.get_nowait()
+            pending_jobs -= 1
+            if pending_jobs == 0:
+                set_status(None)
+            if error is None:
+                try:
+                    on_done(result)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to {action}: {error}")
+                print(f"Error ({action}): {error}")
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, pump_results)
+
+def set_status(text):
+    if lbl_status is not None:
+        lbl_status.config(text=text or "Ready")
+
+fill_generation = 0
+
+def fill_listbox(listbox, items, generation=None):
+    """Replace a Listbox's rows a chunk per event-loop turn, so a large
+    pool never blocks the UI. A newer fill cancels an older one."""
+    global fill_generation
+    if generation is None:
+        fill_generation += 1
+        generation = fill_generation
+        listbox.delete(0, END)
+    if generation != fill_generation:
+        return
+    chunk, rest = items[:FILL_CHUNK], items[FILL_CHUNK:]
+    if chunk:
+        listbox.insert(END, *chunk)
+    if rest:
+        root.after(1, fill_listbox, listbox, rest, generation)
 
 # --- DATABASE FUNCTIONS ---
 def ensure_player_data():
     """Ensure player data exists in database"""
-    try:
-        c.execute("SELECT COUNT(*) FROM stats")
-        count = c.fetchone()[0]
-        if count == 0:
-            # Insert sample data if empty
-            sample_players = [
-                ("Virat Kohli", "BAT", 10),
-                ("Rohit Sharma", "BAT", 10),
-                ("KL Rahul", "BAT", 9),
-                ("Suryakumar Yadav", "BAT", 9),
-                ("MS Dhoni", "WK", 10),
-                ("Rishabh Pant", "WK", 9),
-                ("Ravichandran Ashwin", "AR", 9),
-                ("Hardik Pandya", "AR", 9),
-                ("Jasprit Bumrah", "BWL", 10),
-                ("Bhuvneshwar Kumar", "BWL", 9),
-                ("Yuzvendra Chahal", "BWL", 8),
-            ]
-            c.executemany("INSERT INTO stats (player, ctg, value) VALUES (?, ?, ?)", sample_players)
-            conn.commit()
-            print("✓ Sample player data inserted")
-    except Exception as e:
-        print(f"Error ensuring player data: {e}")
+    with connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM stats").fetchone()[0]
+    if count == 0:
+        # Insert sample data if empty
+        sample_players = [
+            ("Virat Kohli", "BAT", 10),
+            ("Rohit Sharma", "BAT", 10),
+            ("KL Rahul", "BAT", 9),
+            ("Suryakumar Yadav", "BAT", 9),
+            ("MS Dhoni", "WK", 10),
+            ("Rishabh Pant", "WK", 9),
+            ("Ravichandran Ashwin", "AR", 9),
+            ("Hardik Pandya", "AR", 9),
+            ("Jasprit Bumrah", "BWL", 10),
+            ("Bhuvneshwar Kumar", "BWL", 9),
+            ("Yuzvendra Chahal", "BWL", 8),
+        ]
+        with connection() as conn:
+            conn.executemany("INSERT INTO stats (player, ctg, value) VALUES (?, ?, ?)", sample_players)
+        get_catalogue().invalidate()
+        print("✓ Sample player data inserted")
+
+def load_catalogue():
+    """Schema, sample data and the name -> PlayerInfo map (worker thread)"""
+    ensure_schema()
+    ensure_player_data()
+    return {info.name: info for info in get_catalogue().all_players()}
 
 # --- FUNCTIONS ---
 def load_players(category):
     """Load players for selected category"""
-    try:
-        list_players.delete(0, END)
-        c.execute("SELECT player FROM stats WHERE ctg=?", (category,))
-        players = c.fetchall()
-        
+    search_var.set("")
+    
+    def show(players):
+        if cat_var.get() != category or search_var.get().strip():
+            return
         if not players:
-            list_players.insert(END, f"No players in {category} category")
+            fill_listbox(list_players, [f"No players in {category} category"])
             return
-        
-        for p in players:
-            list_players.insert(END, p[0])
+        fill_listbox(list_players, players)
         print(f"✓ Loaded {len(players)} players from {category}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to load players: {e}")
-        print(f"Error loading players: {e}")
+    
+    run_in_background(lambda: get_catalogue().players(category), show, f"load {category} players")
+
+search_after = None
+
+def search_players(event=None):
+    """Show the best matches for the search box, shortly after typing stops"""
+    global search_after
+    if search_after is not None:
+        root.after_cancel(search_after)
+    search_after = root.after(SEARCH_DELAY_MS, run_search)
+
+def run_search():
+    global search_after
+    search_after = None
+    query = search_var.get().strip()
+    if not query:
+        load_players(cat_var.get())
+        return
+    
+    def show(players):
+        if search_var.get().strip() != query:
+            return
+        fill_listbox(list_players, [info.name for info in players] or [f"No players match '{query}'"])
+    
+    run_in_background(lambda: get_catalogue().search(query, SEARCH_LIMIT), show, "search players")
 
 def get_player_value(player_name):
     """Return integer value for a player (safe conversion)."""
-    try:
-        c.execute("SELECT value FROM stats WHERE player=?", (player_name,))
-        row = c.fetchone()
-        if row and row[0] is not None:
-            try:
-                return int(row[0])
-            except (ValueError, TypeError):
-                try:
-                    return int(float(row[0]))
-                except:
-                    return 0
-        return 0
-    except Exception as e:
-        print(f"Error getting player value: {e}")
-        return 0
+    info = player_info.get(player_name)
+    return info.value if info else 0
 
 def add_player(event=None):
     """Add player to selected team"""
@@ -98,6 +191,9 @@ def add_player(event=None):
         if sel in selected_team:
             messagebox.showwarning("Warning", "Player already in team!")
             return
+        if sel not in player_info:
+            messagebox.showwarning("Warning", "Player list is still loading")
+            return
         
         val = get_player_value(sel)
         if val > points_available:
@@ -105,8 +201,15 @@ def add_player(event=None):
                 f"Player '{sel}' costs {val} points but only {points_available} available.")
             return
         
+        try:
+            check_lineup(selected_team + [sel], player_info)
+        except ValueError as e:
+            messagebox.showerror("Invalid team", str(e))
+            return
+        
         selected_team.append(sel)
         list_selected.insert(END, sel)
+        points_used += val
         update_points()
     except Exception as e:
         messagebox.showerror("Error", f"Failed to add player: {e}")
@@ -120,36 +223,37 @@ def remove_player(event=None):
         if sel in selected_team:
             selected_team.remove(sel)
             list_selected.delete(ACTIVE)
+            points_used -= get_player_value(sel)
             update_points()
     except Exception as e:
         messagebox.showerror("Error", f"Failed to remove player: {e}")
         print(f"Error removing player: {e}")
 
 def update_points():
-    """Update points display"""
-    global points_used, points_available
-    try:
-        points_used = 0
-        for p in selected_team:
-            points_used += get_player_value(p)
-        points_available = max(0, 100 - points_used)
-        lbl_points.config(text=f"Points Used: {points_used} | Available: {points_available}")
-    except Exception as e:
-        print(f"Error updating points: {e}")
+    """Update points display from the running total"""
+    global points_available
+    points_available = max(0, 100 - points_used)
+    lbl_points.config(text=f"Points Used: {points_used} | Available: {points_available}")
+
+def set_team(players):
+    """Replace the selected team and recompute the running total once"""
+    global selected_team, points_used
+    selected_team = list(players)
+    list_selected.delete(0, END)
+    if selected_team:
+        list_selected.insert(END, *selected_team)
+    points_used = sum(get_player_value(p) for p in selected_team)
+    update_points()
 
 def new_team():
     """Create new team"""
-    global team_name, selected_team, points_available, points_used
+    global team_name
     try:
         name = simpledialog.askstring("Team Name", "Enter team name:")
         if not name:
             return
         team_name = name
-        selected_team = []
-        list_selected.delete(0, END)
-        points_available = 100
-        points_used = 0
-        update_points()
+        set_team([])
         messagebox.showinfo("Success", f"Team '{name}' created! Add players now.")
     except Exception as e:
         messagebox.showerror("Error", f"Failed to create team: {e}")
@@ -157,47 +261,64 @@ def new_team():
 
 def save_team():
     """Save team to database"""
-    global team_name
-    try:
-        if not team_name:
-            messagebox.showerror("Error", "Create a team first!")
-            return
-        
-        if not selected_team:
-            messagebox.showerror("Error", "Add at least one player to the team!")
+    if not team_name:
+        messagebox.showerror("Error", "Create a team first!")
+        return
+    
+    if not selected_team:
+        messagebox.showerror("Error", "Add at least one player to the team!")
+        return
+    
+    name, players = team_name, list(selected_team)
+    
+    def save():
+        with connection() as conn:
+            begin_write(conn)
+            team_validation.save_team(conn, name, players)
+    
+    def saved(_):
+        messagebox.showinfo("Saved", f"Team '{name}' saved successfully!")
+        print(f"✓ Team '{name}' saved with {len(players)} players")
+    
+    run_in_background(save, saved, "save team")
+
+def suggest_team():
+    """Fill the team with the best-scoring XI within budget"""
+    def show(result):
+        global team_name
+        if result is None:
+            messagebox.showerror("Error", "No valid team fits the budget!")
             return
-
-        players = ",".join(selected_team)
-        c.execute("INSERT OR REPLACE INTO teams VALUES (?,?,?)", 
-                 (team_name, players, points_used))
-        conn.commit()
-        messagebox.showinfo("Saved", f"Team '{team_name}' saved successfully!")
-        print(f"✓ Team '{team_name}' saved with {len(selected_team)} players")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to save team: {e}")
-        print(f"Error saving team: {e}")
+        players, projected, _ = result
+        if not team_name:
+            team_name = team_entry.get().strip() or "Suggested XI"
+        set_team(players)
+        print(f"✓ Suggested team with {projected} projected points")
+    
+    run_in_background(team_solver.suggest_team, show, "suggest team")
 
 def evaluate_team():
     """Calculate and display team score"""
-    try:
-        if not selected_team:
-            messagebox.showerror("Error", "No players in team!")
-            return
-
-        total_score = 0
-        score_details = []
-        for p in selected_team:
-            score = calculate_score(p)
-            total_score += score
-            score_details.append(f"{p}: {score}")
-
-        details_text = "\n".join(score_details)
+    if not selected_team:
+        messagebox.showerror("Error", "No players in team!")
+        return
+    
+    name, players = team_name, list(selected_team)
+    
+    def score():
+        return calculate_scores(players), projection.project(players).team
+    
+    def show(result):
+        scores, projected = result
+        total_score = sum(scores[p] for p in players)
+        details_text = "\n".join(f"{p}: {scores[p]}" for p in players)
+        spread = f"{projected.percentiles[10]:.0f}-{projected.percentiles[90]:.0f}"
         messagebox.showinfo("Team Score", 
-            f"Team: {team_name}\n\n{details_text}\n\n{'='*30}\nTotal Score: {total_score}")
+            f"Team: {name}\n\n{details_text}\n\n{'='*30}\nTotal Score: {total_score}\n"
+            f"Projected Next Match: {projected.mean:.0f} (10th-90th pct: {spread})")
         print(f"✓ Team score calculated: {total_score}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to evaluate team: {e}")
-        print(f"Error evaluating team: {e}")
+    
+    run_in_background(score, show, "evaluate team")
 
 # --- UI WIDGETS ---
 
@@ -234,6 +355,10 @@ lists_frame.pack(pady=10, fill=BOTH, expand=True)
 left_frame = LabelFrame(lists_frame, text="Available Players", font=("Arial", 10, "bold"))
 left_frame.pack(side=LEFT, fill=BOTH, expand=True, padx=5)
 
+search_entry = Entry(left_frame, textvariable=search_var, font=("Arial", 9))
+search_entry.pack(side=TOP, fill=X)
+search_entry.bind("<KeyRelease>", search_players)
+
 list_players = Listbox(left_frame, width=30, height=15, font=("Arial", 9))
 list_players.pack(side=LEFT, fill=BOTH, expand=True)
 list_players.bind("<Double-1>", add_player)
@@ -262,6 +387,9 @@ lbl_points = Label(points_frame, text="Points Used: 0 | Available: 100",
                    font=("Arial", 11, "bold"), fg="green")
 lbl_points.pack(pady=10)
 
+lbl_status = Label(main_frame, text="Ready", font=("Arial", 9), fg="gray")
+lbl_status.pack(side=BOTTOM, anchor=W)
+
 # Buttons Frame
 button_frame = Frame(main_frame)
 button_frame.pack(pady=10)
@@ -272,16 +400,19 @@ Button(button_frame, text="Save Team", width=15, command=save_team,
        font=("Arial", 10), bg="lightgreen").pack(side=LEFT, padx=5)
 Button(button_frame, text="Evaluate Score", width=15, command=evaluate_team, 
        font=("Arial", 10), bg="lightyellow").pack(side=LEFT, padx=5)
+Button(button_frame, text="Suggest Team", width=15, command=suggest_team, 
+       font=("Arial", 10), bg="plum").pack(side=LEFT, padx=5)
 
 # Initialize
-try:
-    ensure_player_data()
+def initialized(info):
+    player_info.update(info)
     cat_var.set("BAT")
     load_players("BAT")
     print("✓ Application initialized successfully")
-except Exception as e:
-    messagebox.showerror("Initialization Error", f"Failed to initialize: {e}")
-    print(f"Initialization error: {e}")
+
+run_in_background(load_catalogue, initialized, "load players")
+root.after(POLL_MS, pump_results)
 
 # Start GUI
 root.mainloop()
+worker.shutdown(wait=False)
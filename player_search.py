@@ -0,0 +1,289 @@
+"""In-memory player name search for autocomplete.
+
+Names are normalized (lowercase, accents and punctuation dropped) and
+indexed two ways:
+
+  prefix  every word-suffix of a name ("virat kohli", "kohli") in
+          sorted lists, so "koh" or "virat ko" is a bisect plus a slice
+  fuzzy   trigrams of each distinct word, for typos ("kohil", "bumra"):
+          words sharing the most trigrams with a query word are checked
+          with a bounded edit distance against the word's prefix
+
+Prefix hits rank whole-name prefix before later-word prefix, then
+alphabetically. Only a query no name starts with falls through to fuzzy
+matching, fewest edits first, so typing a correct prefix stays cheap.
+An index is immutable; PlayerCatalogue builds a new one after each reload.
+"""
+import heapq
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Shortest query word that gets typo-tolerant matching
+FUZZY_MIN_LENGTH = 3
+# Words that share the most trigrams with a query word, checked per query
+FUZZY_CANDIDATES = 10
+# Posting entries counted per query word, rarest trigrams first; common
+# trigrams say little and would dominate the time
+FUZZY_POSTINGS = 1000
+# Names examined per fuzzy query, after which the best found so far are returned
+FUZZY_NAMES = 500
+
+
+def normalize(text):
+    """Lowercase, strip accents, and keep only letters, digits and single spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    chars = [c if c.isalnum() else " " for c in text.lower() if not unicodedata.combining(c)]
+    return " ".join("".join(chars).split())
+
+
+def trigrams(word):
+    padded = f"^{word}"
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def max_edits(word):
+    return 1 if len(word) <= 5 else 2
+
+
+def _last_row(a, b, limit):
+    """Last row of the edit distance table from a to b (row[n] is the
+    distance to b[:n], capped at limit + 1), counting an adjacent swap as
+    one edit; None once every entry exceeds limit. Only cells within
+    `limit` of the diagonal are computed."""
+    big = limit + 1
+    before, previous = None, [min(j, big) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [big] * (len(b) + 1)
+        current[0] = low = min(i, big)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cb = b[j - 1]
+            cost = previous[j - 1] if ca == cb else previous[j - 1] + 1
+            if previous[j] < cost:
+                cost = previous[j] + 1
+            if current[j - 1] < cost:
+                cost = current[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and before[j - 2] < cost:
+                cost = before[j - 2] + 1
+            if cost < low:
+                low = cost
+            current[j] = cost if cost < big else big
+        if low > limit:
+            return None
+        before, previous = previous, current
+    return previous
+
+
+def edit_distance(a, b, limit):
+    """Edit distance between a and b, counting an adjacent swap as one
+    edit, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    row = _last_row(a, b, limit)
+    return limit + 1 if row is None else min(row[-1], limit + 1)
+
+
+def prefix_distance(query, word, limit):
+    """Edits needed to turn `query` into some prefix of `word`, or
+    limit + 1 once it exceeds limit."""
+    word = word[:len(query) + limit]
+    # Each letter of query missing from word needs an edit of its own
+    if len(set(query).difference(word)) > limit:
+        return limit + 1
+    row = _last_row(query, word, limit)
+    return limit + 1 if row is None else min(min(row), limit + 1)
+
+
+class PlayerSearchIndex:
+    """Search structure over a fixed list of player names."""
+
+    def __init__(self, names):
+        # Ids follow (word count, name), so ties between matches break on
+        # the id in favour of shorter names, then alphabetically
+        keyed = sorted((len(normalize(name).split()), name) for name in names)
+        self.names = [name for _, name in keyed]
+        full, later = [], []     # (suffix, name id), whole names and later words
+        words = {}               # word -> [name ids]
+        name_words = []
+        for i, name in enumerate(self.names):
+            parts = normalize(name).split()
+            name_words.append(parts)
+            for position in range(len(parts)):
+                (later if position else full).append((" ".join(parts[position:]), i))
+            for word in set(parts):
+                words.setdefault(word, []).append(i)
+        self._full = self._sorted_keys(full)
+        self._later = self._sorted_keys(later)
+        self._words = sorted(words)
+        self._word_names = [words[word] for word in self._words]
+        word_ids = {word: w for w, word in enumerate(self._words)}
+        self._name_words = [[word_ids[part] for part in parts] for parts in name_words]
+        grams = {}
+        for w, word in enumerate(self._words):
+            for gram in trigrams(word):
+                grams.setdefault(gram, []).append(w)
+        self._grams = grams
+
+    @staticmethod
+    def _sorted_keys(pairs):
+        pairs.sort()
+        return [key for key, _ in pairs], [i for _, i in pairs]
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        start = bisect_left(keys, prefix)
+        return start, bisect_left(keys, prefix + "\uffff", start)
+
+    def _prefix_matches(self, query, accept, limit):
+        """Name ids whose name starts with `query`, then those where a
+        later word onward does."""
+        found, seen = [], set()
+        for keys, ids in (self._full, self._later):
+            start, end = self._prefix_range(keys, query)
+            for i in ids[start:end]:
+                if i in seen or not accept(i):
+                    continue
+                seen.add(i)
+                found.append(i)
+                if len(found) >= limit:
+                    return found
+        return found
+
+    def _fuzzy_words(self, word):
+        """{word id: edits} for indexed words within reach of `word`."""
+        limit = max_edits(word)
+        # Words the query word is a prefix of need no edits
+        start, end = self._prefix_range(self._words, word)
+        found = dict.fromkeys(range(start, min(end, start + FUZZY_CANDIDATES)), 0)
+        shared, counted = self._shared_trigrams(trigrams(word))
+        # Each edit spoils at most three of the query's trigrams
+        needed = counted - 3 * limit
+        for w, count in shared.most_common(FUZZY_CANDIDATES):
+            if w in found:
+                continue
+            if count < needed:
+                break
+            edits = prefix_distance(word, self._words[w], limit)
+            if edits <= limit:
+                found[w] = edits
+        return found
+
+    def _shared_trigrams(self, grams):
+        """(Counter of word id -> trigrams shared with `grams`, number of
+        trigrams counted), rarest first and at most FUZZY_POSTINGS entries."""
+        postings = sorted((self._grams.get(gram, ()) for gram in grams), key=len)
+        shared, counted, size = Counter(), 0, 0
+        for posting in postings:
+            if size + len(posting) > FUZZY_POSTINGS:
+                if not counted:
+                    # Even the rarest trigram is common: sample its first words
+                    shared.update(posting[:FUZZY_POSTINGS])
+                    counted = 1
+                break
+            shared.update(posting)
+            counted, size = counted + 1, size + len(posting)
+        return shared, counted
+
+    def _fuzzy_matches(self, words, accept, limit):
+        """Name ids where every query word is near some word of the name,
+        ranked by total edits, then name id."""
+        matched, short = [], []     # (query word, {word id: edits}), short words
+        for word in words:
+            if len(word) >= FUZZY_MIN_LENGTH:
+                matched.append((word, self._fuzzy_words(word)))
+                continue
+            # Too short to tolerate typos: require a plain prefix
+            start, end = self._prefix_range(self._words, word)
+            if end - start <= FUZZY_POSTINGS:
+                matched.append((None, dict.fromkeys(range(start, end), 0)))
+            else:
+                short.append(word)
+        if not any(m for _, m in matched):
+            return []
+
+        # Walk the names of the word whose matches cover the fewest names;
+        # the other words are looked up in each name's own words
+        covered = [sum(len(self._word_names[w]) for w in m) or len(self)
+                   for _, m in matched]
+        _, driver = matched.pop(covered.index(min(covered)))
+        if min(covered) <= FUZZY_CANDIDATES:
+            # Few names to walk: measure the other words against them
+            # directly rather than trusting their capped candidate sets
+            loose = [word for word, _ in matched if word]
+            matched = [(word, m) for word, m in matched if not word]
+        else:
+            loose = []
+        if not driver or not all(m for _, m in matched):
+            return []
+        floor = sum(min(m.values()) for _, m in matched)
+        levels = {}
+        for w, edits in driver.items():
+            levels.setdefault(edits, []).append(self._word_names[w])
+
+        ranked, seen = [], set()
+        for edits in sorted(levels):
+            best = edits + floor
+            if len(ranked) >= limit and sorted(ranked)[limit - 1][0] <= best:
+                break
+            at_best = 0
+            for i in heapq.merge(*levels[edits]):
+                if i in seen:
+                    continue
+                seen.add(i)
+                if len(seen) > FUZZY_NAMES:
+                    break
+                total = self._name_edits(i, edits, matched, loose, short)
+                if total is None or not accept(i):
+                    continue
+                ranked.append((total, i))
+                if total == best:
+                    # Later names in this level can at best tie, on a higher id
+                    at_best += 1
+                    if at_best >= limit:
+                        break
+        ranked.sort()
+        return [i for _, i in ranked[:limit]]
+
+    def _name_edits(self, i, edits, matched, loose, short):
+        """Total edits for name `i`, or None if some query word misses it."""
+        name_words = self._name_words[i]
+        for _, m in matched:
+            best = None
+            for w in name_words:
+                e = m.get(w)
+                if e is not None and (best is None or e < best):
+                    best = e
+            if best is None:
+                return None
+            edits += best
+        for word in loose:
+            limit = max_edits(word)
+            best = min(prefix_distance(word, self._words[w], limit) for w in name_words)
+            if best > limit:
+                return None
+            edits += best
+        for word in short:
+            if not any(self._words[w].startswith(word) for w in name_words):
+                return None
+        return edits
+
+    def search(self, query, limit=DEFAULT_LIMIT, accept=None):
+        """Up to `limit` names for `query`, best first.
+
+        `accept(name_id)` (optional) filters candidates, e.g. by category.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        accept = accept or (lambda i: True)
+        found = self._prefix_matches(query, accept, limit)
+        words = query.split()
+        if not found and max(map(len, words)) >= FUZZY_MIN_LENGTH:
+            found = self._fuzzy_matches(words, accept, limit)
+        return [self.names[i] for i in found]
@@ -0,0 +1,120 @@
+"""Monte Carlo projections of player and team points.
+
+Each simulation draws one stat line per player, uniformly from that
+player's historical `match` rows, and scores it with the same rule set as
+calculate_score. History is scored once, in one score_columns pass, so a
+draw is just an index into those points: 100k simulations of an XI is
+one (players, simulations) integer gather plus a sum down the columns.
+
+Players without history project to 0 in every simulation. When a
+snapshot is configured (FANTASY_CRICKET_SNAPSHOT) history comes from it,
+as of its export, instead of from SQLite.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from db import connection
+from schema import MATCH_STAT_COLUMNS
+from scoring_engine import MAX_QUERY_PARAMS
+from scoring_rules import get_rules
+from snapshot import get_snapshot
+from stat_lines import StatBlock
+
+DEFAULT_SIMULATIONS = 10000
+MAX_SIMULATIONS = 200000
+PERCENTILES = (10, 50, 90)
+
+# Points summary over the simulations for one player or a whole team
+Summary = namedtuple("Summary", ["mean", "std", "percentiles"])
+
+Projection = namedtuple("Projection", ["team", "players", "simulations", "history"])
+
+
+def summarize(samples, percentiles=PERCENTILES):
+    """Summary of a 1-d array of simulated points."""
+    values = np.percentile(samples, percentiles)
+    return Summary(float(samples.mean()), float(samples.std()),
+                   {p: float(v) for p, v in zip(percentiles, values)})
+
+
+class HistorySampler:
+    """Scored historical lines for a set of players, ready to draw from.
+
+    `points` holds every line's score grouped by player; player i's lines
+    are points[starts[i]:starts[i] + counts[i]].
+    """
+
+    def __init__(self, players, block, rules=None):
+        self.players = list(players)
+        self.rules = get_rules(rules)
+        if len(block):
+            scores = block.scores(self.rules)
+            order = np.argsort(block.player_ids, kind="stable")
+            self.points = scores[order]
+            ids = np.array([block.index.get(p, -1) for p in self.players], dtype=np.int64)
+            counts = np.bincount(block.player_ids, minlength=len(block.players))
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            known = ids >= 0
+            self.counts = np.where(known, counts[np.maximum(ids, 0)], 0)
+            self.starts = np.where(known, offsets[np.maximum(ids, 0)], 0)
+        else:
+            self.points = np.zeros(0, dtype=np.int64)
+            self.counts = np.zeros(len(self.players), dtype=np.int64)
+            self.starts = np.zeros(len(self.players), dtype=np.int64)
+
+    @classmethod
+    def from_snapshot(cls, snap, players, rules=None):
+        """Take these players' lines from a snapshot, without SQLite."""
+        players = list(dict.fromkeys(players))
+        return cls(players, snap.block(players), rules)
+
+    @classmethod
+    def load(cls, conn, players, rules=None):
+        """Read just these players' lines from the match table."""
+        players = list(dict.fromkeys(players))
+        rows = []
+        for start in range(0, len(players), MAX_QUERY_PARAMS):
+            chunk = players[start:start + MAX_QUERY_PARAMS]
+            rows.extend(conn.execute(f"SELECT player, {', '.join(MATCH_STAT_COLUMNS)} FROM match "
+                                     f"WHERE player IN ({','.join('?' * len(chunk))})", chunk))
+        return cls(players, StatBlock.from_rows(rows), rules)
+
+    def sample(self, simulations, rng=None):
+        """(players, simulations) int64 array of simulated points."""
+        rng = np.random.default_rng(rng)
+        counts = self.counts[:, None]
+        if not len(self.points):
+            return np.zeros((len(self.players), simulations), dtype=np.int64)
+        # One uniform draw per cell, scaled to each player's line count
+        picks = (rng.random((len(self.players), simulations)) * counts).astype(np.int64)
+        drawn = self.points[np.minimum(self.starts[:, None] + picks, len(self.points) - 1)]
+        return np.where(counts > 0, drawn, 0)
+
+
+def project(players, simulations=DEFAULT_SIMULATIONS, rules=None, seed=None,
+            percentiles=PERCENTILES, conn=None):
+    """Project each player's and the team's points over `simulations` draws.
+
+    Players are drawn independently. Returns a Projection whose `team` and
+    `players` ({name: Summary}) hold mean, std and percentiles; `history`
+    maps each player to the number of lines sampled from.
+    """
+    players = list(dict.fromkeys(players))
+    snap = get_snapshot() if conn is None else None
+    if snap is not None:
+        sampler = HistorySampler.from_snapshot(snap, players, rules)
+    elif conn is None:
+        with connection() as conn:
+            sampler = HistorySampler.load(conn, players, rules)
+    else:
+        sampler = HistorySampler.load(conn, players, rules)
+
+    samples = sampler.sample(simulations, seed)
+    team = samples.sum(axis=0)
+    return Projection(
+        summarize(team, percentiles),
+        {p: summarize(samples[i], percentiles) for i, p in enumerate(players)},
+        simulations,
+        dict(zip(players, sampler.counts.tolist())),
+    )
@@ -0,0 +1,221 @@
+from datetime import datetime
+
+from db import connection
+
+# Version counters. Seeded from the clock so a recreated database never
+# reuses an old version.
+META_DDL = [
+    """CREATE TABLE IF NOT EXISTS meta
+       (key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0)""",
+    """INSERT OR IGNORE INTO meta (key, value)
+       VALUES ('stats_version', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))""",
+    """INSERT OR IGNORE INTO meta (key, value)
+       VALUES ('match_version', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))""",
+    """INSERT OR IGNORE INTO meta (key, value)
+       VALUES ('team_totals_version', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))""",
+]
+
+# Bumped by triggers on every write to `stats`, so in-process caches can
+# tell when database_setup.py, add_players.py or anything else reseeded it.
+STATS_VERSION_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS stats_version_insert AFTER INSERT ON stats
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'stats_version'; END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_version_update AFTER UPDATE ON stats
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'stats_version'; END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_version_delete AFTER DELETE ON stats
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'stats_version'; END""",
+]
+
+# One row per (team, slot); the second index answers "which teams contain
+# player X" without scanning every team. Foreign keys are not enforced
+# (PRAGMA foreign_keys is off): team_store.delete_team removes a team's
+# rows from every table that references it.
+TEAM_PLAYERS_DDL = [
+    """CREATE TABLE IF NOT EXISTS team_players
+       (team_name TEXT NOT NULL REFERENCES teams(name),
+        player_id INTEGER NOT NULL REFERENCES stats(id),
+        slot INTEGER NOT NULL,
+        PRIMARY KEY (team_name, slot)) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_team_players_player ON team_players (player_id, team_name)",
+]
+
+# Per-player, per-match stat lines. The primary key serves "everyone in
+# match M"; idx_match_player serves "player P's matches" as an index seek.
+MATCH_STAT_COLUMNS = ("scored", "faced", "fours", "sixes", "bowled", "maiden",
+                      "given", "wkts", "catches", "stumping", "runout")
+
+MATCH_DDL = [
+    """CREATE TABLE IF NOT EXISTS match
+       (match_id INTEGER NOT NULL,
+        player TEXT NOT NULL REFERENCES stats(player),
+        scored INTEGER NOT NULL DEFAULT 0,
+        faced INTEGER NOT NULL DEFAULT 0,
+        fours INTEGER NOT NULL DEFAULT 0,
+        sixes INTEGER NOT NULL DEFAULT 0,
+        bowled INTEGER NOT NULL DEFAULT 0,
+        maiden INTEGER NOT NULL DEFAULT 0,
+        given INTEGER NOT NULL DEFAULT 0,
+        wkts INTEGER NOT NULL DEFAULT 0,
+        catches INTEGER NOT NULL DEFAULT 0,
+        stumping INTEGER NOT NULL DEFAULT 0,
+        runout INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (match_id, player)) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_match_player ON match (player, match_id)",
+]
+
+# Any write to match invalidates materialized scores. A bulk load inserts a
+# 'match_version_paused' meta row inside its own transaction, bumps the
+# version once itself and deletes the row before committing, so no other
+# connection ever sees the triggers paused.
+MATCH_VERSION_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS match_version_insert AFTER INSERT ON match
+       WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'match_version_paused')
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'match_version'; END""",
+    """CREATE TRIGGER IF NOT EXISTS match_version_update AFTER UPDATE ON match
+       WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'match_version_paused')
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'match_version'; END""",
+    """CREATE TRIGGER IF NOT EXISTS match_version_delete AFTER DELETE ON match
+       WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'match_version_paused')
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'match_version'; END""",
+]
+
+# Materialized season points per player and per team, kept current by
+# live_scoring and valid while meta.totals_version == meta.match_version.
+TOTALS_DDL = [
+    """CREATE TABLE IF NOT EXISTS player_points
+       (player TEXT PRIMARY KEY,
+        points INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS team_totals
+       (team_name TEXT PRIMARY KEY REFERENCES teams(name),
+        total_score INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID""",
+    # One bump per changed row lets leaderboard tell its own writes from others'
+    """CREATE TRIGGER IF NOT EXISTS team_totals_version_insert AFTER INSERT ON team_totals
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'team_totals_version'; END""",
+    """CREATE TRIGGER IF NOT EXISTS team_totals_version_update AFTER UPDATE ON team_totals
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'team_totals_version'; END""",
+    """CREATE TRIGGER IF NOT EXISTS team_totals_version_delete AFTER DELETE ON team_totals
+       BEGIN UPDATE meta SET value = value + 1 WHERE key = 'team_totals_version'; END""",
+]
+
+# Per-match team scores written by settle_match.py
+TEAM_MATCH_SCORES_DDL = [
+    """CREATE TABLE IF NOT EXISTS team_match_scores
+       (match_id INTEGER NOT NULL,
+        team_name TEXT NOT NULL REFERENCES teams(name),
+        total_score INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (match_id, team_name)) WITHOUT ROWID""",
+]
+
+# Last persisted ranking, written by leaderboard.save_snapshot()
+LEADERBOARD_DDL = [
+    """CREATE TABLE IF NOT EXISTS leaderboard_snapshot
+       (rank INTEGER PRIMARY KEY,
+        team_name TEXT NOT NULL UNIQUE,
+        total_score INTEGER NOT NULL,
+        taken_at TEXT NOT NULL)""",
+]
+
+
+def migrate_match(conn):
+    """Rebuild a legacy keyless `match` table into the keyed layout.
+
+    Each player's legacy rows become matches 1, 2, ... in insertion order.
+    Returns the number of rows moved (0 if there was nothing to migrate).
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(match)")]
+    if not columns or "match_id" in columns:
+        return 0
+
+    stat_list = ", ".join(MATCH_STAT_COLUMNS)
+    conn.execute("ALTER TABLE match RENAME TO match_legacy")
+    for statement in MATCH_DDL + MATCH_VERSION_DDL:
+        conn.execute(statement)
+    moved = conn.execute(f"""INSERT INTO match (match_id, player, {stat_list})
+                            SELECT ROW_NUMBER() OVER (PARTITION BY player ORDER BY rowid),
+                                   player, {", ".join(f"COALESCE({col}, 0)" for col in MATCH_STAT_COLUMNS)}
+                            FROM match_legacy WHERE player IS NOT NULL""").rowcount
+    conn.execute("DROP TABLE match_legacy")
+    return moved
+
+
+def migrate_match_triggers(conn):
+    """Drop match_version triggers that predate the paused guard, so
+    ensure_schema recreates them. Returns the number dropped."""
+    rows = conn.execute("""SELECT name FROM sqlite_master
+                           WHERE type = 'trigger' AND tbl_name = 'match'
+                             AND name LIKE 'match_version_%'
+                             AND sql NOT LIKE '%match_version_paused%'""").fetchall()
+    for (name,) in rows:
+        conn.execute(f"DROP TRIGGER {name}")
+    return len(rows)
+
+
+def migrate_team_players(conn):
+    """Move comma-joined teams.players strings into team_players.
+
+    Migrated rows get players=NULL, so running this again is a no-op.
+    Names missing from stats are dropped with a warning, and points_used
+    is recomputed from the players kept. Returns the number of teams moved.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(teams)")]
+    if "players" not in columns:
+        return 0
+
+    known = {player: (id_, value) for id_, player, value
+             in conn.execute("SELECT id, player, value FROM stats").fetchall()}
+    rows = conn.execute("SELECT name, players FROM teams WHERE players IS NOT NULL").fetchall()
+    for name, players in rows:
+        names = players.split(',') if players else []
+        kept = [p for p in names if p in known]
+        dropped = [p for p in names if p not in known]
+        if dropped:
+            print(f"[WARNING] Team '{name}': dropped unknown players {', '.join(dropped)}")
+        conn.execute("DELETE FROM team_players WHERE team_name=?", (name,))
+        conn.executemany("INSERT INTO team_players (team_name, player_id, slot) VALUES (?,?,?)",
+                         [(name, known[p][0], slot) for slot, p in enumerate(kept)])
+        conn.execute("UPDATE teams SET players=NULL, points_used=? WHERE name=?",
+                     (sum(known[p][1] or 0 for p in kept), name))
+    return len(rows)
+
+
+def migrate_teams_created_at(conn):
+    """Give older teams tables a stored created_at column.
+
+    Existing teams are stamped with the migration time, the earliest
+    moment we know they existed. Returns True if the column was added.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(teams)")]
+    if not columns or "created_at" in columns:
+        return False
+    conn.execute("ALTER TABLE teams ADD COLUMN created_at TEXT")
+    conn.execute("UPDATE teams SET created_at = ?", (datetime.now().isoformat(),))
+    return True
+
+
+def ensure_schema(conn=None):
+    """Create any tables, indexes and triggers the app relies on."""
+    if conn is None:
+        with connection() as conn:
+            return ensure_schema(conn)
+    for statement in META_DDL:
+        conn.execute(statement)
+    migrate_match(conn)
+    migrate_match_triggers(conn)
+    for statement in (STATS_VERSION_DDL + TEAM_PLAYERS_DDL + MATCH_DDL + MATCH_VERSION_DDL
+                      + TOTALS_DDL + TEAM_MATCH_SCORES_DDL + LEADERBOARD_DDL):
+        conn.execute(statement)
+    migrate_team_players(conn)
+    migrate_teams_created_at(conn)
+    conn.commit()
+
+
+def get_version(conn, key):
+    """Read a counter from the meta table (0 if missing)."""
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_version(conn, key, value):
+    """Write a counter to the meta table."""
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?,?)", (key, value))
@@ -0,0 +1,164 @@
+"""Push channel for live team totals.
+
+Clients subscribe to a set of teams and receive only the totals that
+changed. All changes arrive through the leaderboard, which already learns
+about every team_totals update: in-process writers report them directly
+and a single background ticker picks up everything else (imports,
+settlement jobs, other processes) by checking the version counters once
+per POLL_INTERVAL. One computation fans out to any number of
+subscribers.
+"""
+import json
+import threading
+from collections import defaultdict
+
+import instrumentation
+import live_scoring
+from db import Lazy, connection
+from leaderboard import get_leaderboard
+
+# How often the ticker looks for changes made outside this process
+POLL_INTERVAL = 1.0
+
+# Teams one subscription may follow
+MAX_TEAMS = 200
+
+# Idle streams send a comment this often so proxies keep them open
+KEEPALIVE = 15.0
+KEEPALIVE_EVENT = ": keepalive\n\n"
+
+
+def format_event(event, data):
+    """One Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    """Changed totals for one client, coalesced until it reads them.
+
+    A slow reader never builds a backlog: it gets the latest total for
+    each team that moved since its last read.
+    """
+
+    def __init__(self, teams, notify=None):
+        self.teams = frozenset(teams)
+        self.closed = False
+        self._notify = notify
+        self._pending = {}
+        self._cond = threading.Condition()
+
+    def push(self, changes):
+        with self._cond:
+            self._pending.update(changes)
+            self._cond.notify()
+        if self._notify is not None:
+            self._notify()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+        if self._notify is not None:
+            self._notify()
+
+    def drain(self):
+        """Take whatever is pending without waiting."""
+        with self._cond:
+            changes, self._pending = self._pending, {}
+            return changes
+
+    def wait(self, timeout=None):
+        """Block until something changes (or timeout); {} on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self.closed, timeout)
+            changes, self._pending = self._pending, {}
+            return changes
+
+
+class ScoreFeed:
+    """Routes leaderboard changes to the subscriptions that follow them."""
+
+    def __init__(self, leaderboard, poll_interval=POLL_INTERVAL):
+        self.leaderboard = leaderboard
+        self.poll_interval = poll_interval
+        self._by_team = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ticker = None
+        self._wake = threading.Event()
+        leaderboard.add_listener(self._on_change)
+
+    def subscribe(self, teams, notify=None):
+        """Follow `teams`; `notify()` (if given) is called on each push,
+        from whichever thread made the change."""
+        subscription = Subscription(teams, notify)
+        with self._lock:
+            for team in subscription.teams:
+                self._by_team[team].add(subscription)
+            if self._ticker is None:
+                self._ticker = threading.Thread(target=self._tick, name="score-feed", daemon=True)
+                self._ticker.start()
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for team in subscription.teams:
+                followers = self._by_team.get(team)
+                if followers is not None:
+                    followers.discard(subscription)
+                    if not followers:
+                        del self._by_team[team]
+        subscription.close()
+
+    def current(self, subscription):
+        """Current totals for everything a subscription follows."""
+        return self.leaderboard.totals(subscription.teams)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for followers in self._by_team.values() for s in followers})
+
+    def _on_change(self, changes):
+        batches = defaultdict(dict)
+        with self._lock:
+            for team, total in changes.items():
+                for subscription in self._by_team.get(team, ()):
+                    batches[subscription][team] = total
+        for subscription, batch in batches.items():
+            subscription.push(batch)
+
+    def _tick(self):
+        while True:
+            if not self._by_team:
+                # Idle until someone subscribes
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                with connection() as conn:
+                    # Rescore once here if match changed, so every
+                    # subscriber's update comes from this one rebuild
+                    live_scoring.ensure_totals(conn)
+                self.leaderboard.sync()
+            except Exception as e:
+                print(f"[WARNING] Score feed poll failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+def _start_feed():
+    feed = ScoreFeed(get_leaderboard())
+    instrumentation.register_collector(lambda: [
+        ("fantasy_score_feed_subscribers", "gauge", "Open live-score streams.",
+         feed.subscriber_count),
+    ])
+    return feed
+
+
+_feed = Lazy(_start_feed)
+
+
+def get_feed():
+    """Return the process-wide feed, creating it on first use."""
+    return _feed.get()
@@ -1,55 +1,174 @@
-import sqlite3
-
-def calculate_score(player):
-    conn = sqlite3.connect("fantasy_cricket.db")
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM match WHERE player=?", (player,))
-    data = c.fetchone()
-    conn.close()
-
-    if not data:
-        return 0
-
-    (_, scored, faced, fours, sixes, bowled, maiden, given, wkts, catches, stumping, runout) = data
-
-    score = 0
-
-    # Batting
-    score += scored // 2
-    if scored >= 100:
-        score += 10
-    elif scored >= 50:
-        score += 5
-
-    strike_rate = (scored / faced) * 100 if faced else 0
-    if 80 <= strike_rate <= 100:
-        score += 2
-    elif strike_rate > 100:
-        score += 6
-
-    score += (fours * 1)
-    score += (sixes * 2)
-
-    # Bowling
-    score += (wkts * 10)
-    if wkts >= 5:
-        score += 10
-    elif wkts >= 3:
-        score += 5
-
-    if bowled > 0:
-        economy = given / (bowled / 6)
-        if 3.5 <= economy <= 4.5:
-            score += 4
-        elif 2 <= economy < 3.5:
-            score += 7
-        elif economy < 2:
-            score += 10
-
-    # Fielding
-    score += catches * 10
-    score += stumping * 10
-    score += runout * 10
+import os
+import threading
+from collections import OrderedDict
 
+import numpy as np
+
+import instrumentation
+from db import connection
+from instrumentation import timed
+from schema import MATCH_STAT_COLUMNS, get_version
+from scoring_rules import get_rules
+
+# SQLite caps the number of bound parameters per statement
+MAX_QUERY_PARAMS = 900
+
+SCORE_CACHE_SIZE = int(os.environ.get("FANTASY_CRICKET_SCORE_CACHE", "50000"))
+
+MATCH_SELECT = "SELECT player, " + ", ".join(MATCH_STAT_COLUMNS) + " FROM match"
+
+
+class ScoreCache:
+    """Bounded LRU of computed scores, keyed by (rules.key, player, match_id)
+    within a match-data version.
+
+    Any write to `match` bumps meta.match_version (via triggers); the first
+    lookup under a newer version drops every entry from the old one. A
+    lookup from a reader still on an older version is a plain miss.
+    """
+
+    def __init__(self, maxsize=SCORE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        """True if `version` is the current one, advancing to it if newer."""
+        if self.version is None or version > self.version:
+            self._entries.clear()
+            self.version = version
+        return version == self.version
+
+    def get(self, version, key):
+        """Cached score or None."""
+        with self._lock:
+            current = self._check_version(version)
+            score = self._entries.get(key) if current else None
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, version, key, score):
+        with self._lock:
+            # A newer version was seen meanwhile; this score may be stale
+            if version != self.version:
+                return
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+score_cache = ScoreCache()
+instrumentation.register_collector(lambda: [
+    ("fantasy_score_cache_hits_total", "counter", "Score cache hits.", score_cache.hits),
+    ("fantasy_score_cache_misses_total", "counter", "Score cache misses.", score_cache.misses),
+    ("fantasy_score_cache_evictions_total", "counter", "Score cache LRU evictions.", score_cache.evictions),
+    ("fantasy_score_cache_entries", "gauge", "Scores currently cached.", len(score_cache._entries)),
+])
+
+
+def score_line(data, rules=None):
+    """Score one (player, scored, ..., runout) stat line.
+
+    `rules` names a rule set in rules/ (default FANTASY_CRICKET_RULES).
+    """
+    return get_rules(rules).score_line(data)
+
+
+@timed('calculate_score')
+def calculate_score(player, match_id=None, rules=None):
+    """Points for one match, or summed over all of the player's matches."""
+    rules = get_rules(rules)
+    query = MATCH_SELECT + " WHERE player=?"
+    params = (player,)
+    if match_id is not None:
+        query += " AND match_id=?"
+        params += (match_id,)
+
+    with connection() as conn:
+        version = get_version(conn, "match_version")
+        score = score_cache.get(version, (rules.key, player, match_id))
+        if score is not None:
+            return score
+        rows = conn.execute(query, params).fetchall()
+
+    score = sum(rules.score_line(row) for row in rows)
+    score_cache.put(version, (rules.key, player, match_id), score)
     return score
+
+
+def score_frame(rows, rules=None):
+    """Score many stat lines at once with the same rules as score_line.
+
+    `rows` are (player, scored, ..., runout) tuples as selected by
+    MATCH_SELECT. Returns an int64 array aligned with `rows`.
+    """
+    return get_rules(rules).score_frame(rows)
+
+
+@timed('calculate_scores')
+def calculate_scores(players, match_id=None, rules=None):
+    """Score many players with one indexed pass over `match`.
+
+    Returns a dict of player -> score with the same meaning as
+    calculate_score; players without match rows score 0.
+    """
+    players = list(dict.fromkeys(players))
+    if not players:
+        return {}
+    rules = get_rules(rules)
+
+    scores = {}
+    rows = []
+    with connection() as conn:
+        version = get_version(conn, "match_version")
+        missing = []
+        for player in players:
+            score = score_cache.get(version, (rules.key, player, match_id))
+            if score is None:
+                missing.append(player)
+            else:
+                scores[player] = score
+
+        for start in range(0, len(missing), MAX_QUERY_PARAMS):
+            chunk = missing[start:start + MAX_QUERY_PARAMS]
+            query = MATCH_SELECT + f" WHERE player IN ({','.join('?' * len(chunk))})"
+            params = list(chunk)
+            if match_id is not None:
+                query += " AND match_id=?"
+                params.append(match_id)
+            rows.extend(conn.execute(query, params).fetchall())
+
+    position = {player: i for i, player in enumerate(missing)}
+    totals = np.zeros(len(missing), dtype=np.int64)
+    np.add.at(totals, [position[row[0]] for row in rows], rules.score_frame(rows))
+    for player, score in zip(missing, totals.tolist()):
+        score_cache.put(version, (rules.key, player, match_id), score)
+        scores[player] = score
+    return {player: scores[player] for player in players}
@@ -0,0 +1,265 @@
+"""Points rules as data.
+
+Each rule set is a JSON file in RULES_DIR (rules/t20.json, rules/odi.json,
+rules/test.json, ...) with two kinds of rule:
+
+  per_unit  {"stat": "sixes", "points": 2}, optionally "per": n to award
+            points for every whole n (runs // 2)
+  bands     {"metric": "economy", "default": 10,
+             "bands": [{"ge": 2, "points": 7}, {"gt": 4.5, "points": 0}]}
+            thresholds ascend; a value earns the points of the last
+            threshold it passes, or the default if it passes none
+
+A band metric is any match stat column, or strike_rate (runs per 100
+balls, 0 when no balls faced) or economy (runs per over; no points when
+no balls bowled).
+
+Rule sets are compiled once per load: score_line becomes generated
+straight-line code (comparisons for short bands, bisect for long ones),
+and score_frame runs one searchsorted per band over whole columns. Files are
+re-checked at most once per CHECK_INTERVAL and recompiled when they
+change, so an edited rule set goes live without a restart.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from db import CHECK_INTERVAL
+from schema import MATCH_STAT_COLUMNS
+
+RULES_DIR = os.environ.get("FANTASY_CRICKET_RULES_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules"))
+DEFAULT_RULES = os.environ.get("FANTASY_CRICKET_RULES", "t20")
+
+# Stat lines are (player, scored, ..., runout), as selected by MATCH_SELECT
+COLUMN_INDEX = {col: i + 1 for i, col in enumerate(MATCH_STAT_COLUMNS)}
+DERIVED_METRICS = ("strike_rate", "economy")
+
+# Bands with up to this many thresholds compile to comparisons, not bisect
+INLINE_BANDS = 4
+
+
+class RuleError(ValueError):
+    """Raised for a missing or malformed rule set."""
+
+
+class Band:
+    """One compiled band rule."""
+    __slots__ = ("metric", "ge", "gt", "points", "_arrays")
+
+    def __init__(self, spec):
+        self.metric = spec.get("metric")
+        if self.metric not in COLUMN_INDEX and self.metric not in DERIVED_METRICS:
+            raise RuleError(f"Unknown band metric: {self.metric!r}")
+
+        ge, gt, points, last = [], [], [int(spec.get("default", 0))], None
+        for band in spec.get("bands", []):
+            if ("ge" in band) == ("gt" in band):
+                raise RuleError(f"{self.metric} band needs exactly one of 'ge' or 'gt'")
+            # A 'gt x' threshold sits just above a 'ge x' one
+            key = (float(band["ge"]), 0) if "ge" in band else (float(band["gt"]), 1)
+            if last is not None and key <= last:
+                raise RuleError(f"{self.metric} band thresholds must ascend")
+            (ge if key[1] == 0 else gt).append(key[0])
+            points.append(int(band["points"]))
+            last = key
+        self.ge, self.gt, self.points = ge, gt, points
+        self._arrays = (np.array(ge), np.array(gt), np.array(points, dtype=np.int64))
+
+    def lookup_array(self, values):
+        ge, gt, points = self._arrays
+        return points[np.searchsorted(ge, values, side="right") + np.searchsorted(gt, values, side="left")]
+
+
+class RuleSet:
+    """A compiled rule set. `key` changes whenever the rules do.
+
+    score_line(data) scores one (player, scored, ..., runout) stat line;
+    score_frame(rows) scores many at once.
+    """
+
+    def __init__(self, name, spec, revision=0):
+        self.name = name
+        self.description = spec.get("description", "")
+        self.revision = revision
+        self.key = (name, revision)
+        try:
+            self.per_unit = []
+            for rule in spec.get("per_unit", []):
+                if rule.get("stat") not in COLUMN_INDEX:
+                    raise RuleError(f"Unknown stat: {rule.get('stat')!r}")
+                per = int(rule.get("per", 1))
+                if per < 1:
+                    raise RuleError(f"{rule['stat']}: 'per' must be at least 1")
+                self.per_unit.append((COLUMN_INDEX[rule["stat"]], per, int(rule["points"])))
+            self.bands = [Band(band) for band in spec.get("bands", [])]
+            self.score_line = self._compile_line()
+        except (KeyError, TypeError, ValueError) as e:
+            if isinstance(e, RuleError):
+                raise
+            raise RuleError(f"Rule set {name!r} is malformed: {e!r}")
+
+    def _compile_line(self):
+        """Build score_line as straight-line generated code.
+
+        Short bands become chained comparisons; longer ones a bisect pair.
+        """
+        unpack = ", ".join(("_",) + MATCH_STAT_COLUMNS)
+        terms = []
+        for index, per, points in self.per_unit:
+            term = MATCH_STAT_COLUMNS[index - 1] + (f" // {per}" if per != 1 else "")
+            terms.append(term if points == 1 else f"{points} * ({term})")
+        body = ["def score_line(data):", f"    {unpack} = data",
+                f"    score = {' + '.join(terms) or '0'}"]
+
+        env = {"bisect_left": bisect_left, "bisect_right": bisect_right}
+        for i, band in enumerate(self.bands):
+            indent = "    "
+            if band.metric == "strike_rate":
+                body.append(f"    value{i} = (scored / faced) * 100 if faced else 0")
+            elif band.metric == "economy":
+                body.append("    if bowled:")
+                body.append(f"        value{i} = given / (bowled / 6)")
+                indent = "        "
+            value = band.metric if band.metric in COLUMN_INDEX else f"value{i}"
+
+            if len(band.ge) + len(band.gt) <= INLINE_BANDS:
+                thresholds = sorted([(x, 0, ">=") for x in band.ge] + [(x, 1, ">") for x in band.gt])
+                expr = str(band.points[0])
+                for (x, _, op), points in zip(thresholds, band.points[1:]):
+                    x = int(x) if x.is_integer() else x
+                    expr = f"{points} if {value} {op} {x!r} else {expr}"
+            else:
+                env[f"ge{i}"], env[f"gt{i}"], env[f"points{i}"] = band.ge, band.gt, band.points
+                expr = f"points{i}[bisect_right(ge{i}, {value}) + bisect_left(gt{i}, {value})]"
+            body.append(f"{indent}score += {expr}")
+        body.append("    return score")
+        exec(compile("\n".join(body), f"<rules {self.name}>", "exec"), env)
+        return env["score_line"]
+
+    def score_frame(self, rows):
+        """Score many stat lines at once; returns an int64 array aligned
+        with `rows`."""
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        return self.score_columns(np.array([row[1:len(MATCH_STAT_COLUMNS) + 1] for row in rows],
+                                           dtype=np.int64).T)
+
+    def score_columns(self, cols):
+        """Score stat columns: `cols` is a (len(MATCH_STAT_COLUMNS), n)
+        integer array, one row per stat. Returns n int64 scores."""
+        n = cols.shape[1]
+
+        def column(name):
+            return cols[COLUMN_INDEX[name] - 1]
+
+        score = np.zeros(n, dtype=np.int64)
+        for index, per, points in self.per_unit:
+            score += points * (cols[index - 1] // per)
+
+        for band in self.bands:
+            if band.metric == "strike_rate":
+                value = np.zeros(n)
+                faced = column("faced")
+                np.divide(column("scored"), faced, out=value, where=faced != 0)
+                score += band.lookup_array(value * 100)
+            elif band.metric == "economy":
+                bowled = column("bowled")
+                value = np.zeros(n)
+                np.divide(column("given"), bowled / 6, out=value, where=bowled > 0)
+                score += np.where(bowled > 0, band.lookup_array(value), 0)
+            else:
+                score += band.lookup_array(column(band.metric))
+        return score
+
+
+def load_rules(path, name=None):
+    """Compile the rule set in `path`."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        spec = json.loads(raw)
+    except ValueError as e:
+        raise RuleError(f"{path}: {e}")
+    name = name or spec.get("name") or os.path.splitext(os.path.basename(path))[0]
+    return RuleSet(name, spec, zlib.crc32(raw))
+
+
+class RuleRegistry:
+    """Compiled rule sets by name, recompiled when their file changes.
+
+    If an edited file fails to compile, the last good version stays live.
+    """
+
+    def __init__(self, rules_dir=RULES_DIR, check_interval=CHECK_INTERVAL):
+        self.rules_dir = rules_dir
+        self.check_interval = check_interval
+        self._loaded = {}     # name -> (RuleSet, (mtime, size), checked_at)
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.rules_dir, f"{name}.json")
+
+    def names(self):
+        """Rule sets available in the rules directory."""
+        try:
+            files = os.listdir(self.rules_dir)
+        except OSError:
+            return []
+        return sorted(f[:-5] for f in files if f.endswith(".json"))
+
+    def get(self, name=None):
+        name = name or DEFAULT_RULES
+        entry = self._loaded.get(name)
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.check_interval:
+            return entry[0]
+
+        with self._lock:
+            entry = self._loaded.get(name)
+            try:
+                stat = os.stat(self.path(name))
+            except OSError:
+                if entry is None:
+                    raise RuleError(f"No rule set named {name!r} in {self.rules_dir}")
+                self._loaded[name] = (entry[0], entry[1], now)
+                return entry[0]
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if entry is not None and entry[1] == signature:
+                self._loaded[name] = (entry[0], signature, now)
+                return entry[0]
+            try:
+                rules = load_rules(self.path(name), name)
+            except (OSError, RuleError) as e:
+                if entry is None:
+                    raise
+                print(f"[WARNING] Keeping previous {name!r} rules: {e}")
+                self._loaded[name] = (entry[0], signature, now)
+                return entry[0]
+            if entry is not None:
+                print(f"[INFO] Reloaded {name!r} scoring rules")
+            self._loaded[name] = (rules, signature, now)
+            return rules
+
+
+_registry = RuleRegistry()
+
+
+def get_rules(name=None):
+    """The compiled rule set `name` (default FANTASY_CRICKET_RULES).
+
+    A RuleSet is passed through, so callers can take either.
+    """
+    if isinstance(name, RuleSet):
+        return name
+    return _registry.get(name)
+
+
+def available_rules():
+    return _registry.names()
@@ -0,0 +1,257 @@
+"""JSON encoding and response compression for the API.
+
+dumps() uses orjson when it is installed and the stdlib json module
+otherwise; both write compact UTF-8 with sorted keys, as Flask's own
+provider does, and install(app) makes jsonify() use it. Large mappings
+can be streamed with stream_object(), which encodes STREAM_BATCH items
+at a time instead of building one big string.
+
+install(app) adds an after_request hook that gzip- or brotli-compresses
+JSON, HTML and JS bodies of at least MIN_COMPRESS_SIZE bytes when the
+client accepts it (brotli only if the brotli module is installed).
+Streamed JSON is compressed as it is produced.
+
+cached_response() serves payloads that only change with a known key
+(the category list, a catalogue version): the body is encoded once and
+each compressed variant is built once, on first request.
+"""
+import datetime
+import decimal
+import gzip
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed
+MIN_COMPRESS_SIZE = int(os.environ.get("FANTASY_CRICKET_MIN_COMPRESS", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Items encoded per chunk when streaming
+STREAM_BATCH = 500
+# Pre-encoded payloads kept by cached_response()
+ENCODED_CACHE_SIZE = 64
+
+COMPRESSIBLE = ("application/json", "text/html", "text/css", "application/javascript", "text/javascript")
+JSON_MIMETYPE = "application/json"
+
+
+def _default(obj):
+    """Types neither backend handles natively."""
+    if hasattr(obj, "tolist"):
+        # numpy scalars and arrays
+        return obj.tolist()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(obj):
+        """Compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), sort_keys=True,
+                                default=_default)
+
+    def dumps(obj):
+        """Compact UTF-8 JSON bytes."""
+        return _encoder.encode(obj).encode("utf-8")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider on dumps(), so jsonify() uses the fast backend."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def stream_object(pairs):
+    """Yield a JSON object of (key, value) `pairs`, in chunks."""
+    yield b"{"
+    batch, first = [], True
+    for key, value in pairs:
+        batch.append(dumps(str(key)) + b":" + dumps(value))
+        if len(batch) >= STREAM_BATCH:
+            yield (b"" if first else b",") + b",".join(batch)
+            batch, first = [], False
+    if batch:
+        yield (b"" if first else b",") + b",".join(batch)
+    yield b"}"
+
+
+def streamed_response(chunks, status=200):
+    """A JSON response sent as `chunks` are produced."""
+    return Response(chunks, status=status, mimetype=JSON_MIMETYPE)
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """'br', 'gzip' or None for an Accept-Encoding header; brotli wins ties."""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks as it is consumed."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            out = process(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class Encoded:
+    """A payload encoded once, with compressed variants made on demand."""
+
+    def __init__(self, body):
+        self.body = body
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        if encoding is None or len(self.body) < MIN_COMPRESS_SIZE:
+            return None, self.body
+        data = self._variants.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._variants.get(encoding)
+                if data is None:
+                    data = self._variants[encoding] = compress(self.body, encoding)
+        return encoding, data
+
+
+_encoded = OrderedDict()
+_encoded_lock = threading.Lock()
+
+
+def encoded(key, build):
+    """The Encoded payload for `key`, calling build() on a miss.
+
+    `key` must change whenever the payload would, e.g. include a version.
+    """
+    with _encoded_lock:
+        entry = _encoded.get(key)
+        if entry is not None:
+            _encoded.move_to_end(key)
+            return entry
+    entry = Encoded(dumps(build()))
+    with _encoded_lock:
+        _encoded[key] = entry
+        while len(_encoded) > ENCODED_CACHE_SIZE:
+            _encoded.popitem(last=False)
+    return entry
+
+
+def cached_response(key, build):
+    """A JSON response from the pre-encoded payload for `key`, in the
+    encoding the client asked for."""
+    encoding, body = encoded(key, build).variant(choose_encoding(request.headers.get("Accept-Encoding")))
+    response = Response(body, mimetype=JSON_MIMETYPE)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _compressible(response):
+    return (response.status_code == 200
+            and response.mimetype in COMPRESSIBLE
+            and "Content-Encoding" not in response.headers)
+
+
+def install(app):
+    """Route a Flask app's jsonify() through dumps() and compress its
+    eligible responses."""
+    app.json = JSONProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        if not _compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            if response.direct_passthrough:
+                return response
+            data = response.get_data()
+            if len(data) < MIN_COMPRESS_SIZE:
+                return response
+            response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        # Same content, different bytes: keep validators matching across encodings
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Score every saved team for one match, in parallel.
+
+    python settle_match.py 12
+    python settle_match.py 12 --workers 8 --shards 64
+    python settle_match.py 12 --snapshot season.fcs
+
+The match's stat lines are scored once, up front, with the chosen rule
+set (see scoring_rules.py). That {player id: points} snapshot is handed
+to a pool of worker processes, each of which reads a rowid range of
+`teams` through its own read-only connection and sums its teams' slots. The parent bulk-upserts
+every finished shard into team_match_scores and reports progress.
+
+Teams saved while the job runs may or may not be included; re-running is
+safe, as rows are upserted on (match_id, team_name).
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+
+import db
+from schema import MATCH_STAT_COLUMNS, ensure_schema
+from scoring_rules import RuleError
+from snapshot import Snapshot, SnapshotError
+from stat_lines import StatBlock
+
+SHARDS_PER_WORKER = 4
+UPSERT = ("INSERT INTO team_match_scores (match_id, team_name, total_score) VALUES (?,?,?) "
+          "ON CONFLICT (match_id, team_name) DO UPDATE SET total_score=excluded.total_score")
+
+# Worker process state, set once by _init_worker
+_conn = None
+_points = None
+_match_id = None
+
+
+def match_points(conn, match_id, rules=None):
+    """{stats id: points} for everyone with a stat line in `match_id`."""
+    cursor = conn.execute(f"""SELECT s.id, {', '.join('m.' + col for col in MATCH_STAT_COLUMNS)}
+                              FROM match m JOIN stats s ON s.player = m.player
+                              WHERE m.match_id=?""", (match_id,))
+    return StatBlock.from_rows(cursor).player_totals(rules)
+
+
+def shard_bounds(conn, shards):
+    """Split the teams rowid range into at most `shards` (low, high] ranges."""
+    low, high = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM teams").fetchone()
+    if low is None:
+        return []
+    low -= 1
+    step = max(1, -(-(high - low) // shards))
+    return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+
+def _init_worker(db_file, match_id, points):
+    global _conn, _points, _match_id
+    _conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    _points = points
+    _match_id = match_id
+
+
+def score_shard(bounds):
+    """(match_id, team_name, total) rows for teams with rowid in (low, high]."""
+    rows = _conn.execute("""SELECT t.name, tp.player_id FROM teams t
+                            LEFT JOIN team_players tp ON tp.team_name = t.name
+                            WHERE t.rowid > ? AND t.rowid <= ?
+                            ORDER BY t.rowid""", bounds).fetchall()
+    points = _points
+    return [(_match_id, name, sum(points.get(row[1], 0) for row in group))
+            for name, group in groupby(rows, key=lambda row: row[0])]
+
+
+def settle(match_id, workers=None, shards=None, rules=None, snapshot=None):
+    """Score every team for `match_id`. Returns the number of teams written.
+
+    With `snapshot` (a path), stat lines come from that file, not `match`.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * SHARDS_PER_WORKER
+
+    with db.connection() as conn:
+        ensure_schema(conn)
+        if snapshot:
+            snap = Snapshot(snapshot)
+            if not snap.is_current(conn):
+                print(f"[WARNING] {snapshot} predates the latest stats or match changes")
+            points = snap.match_points(match_id, rules)
+        else:
+            points = match_points(conn, match_id, rules)
+        bounds = shard_bounds(conn, shards)
+        total = conn.execute("SELECT COUNT(*) FROM teams").fetchone()[0]
+
+    if not points:
+        print(f"[WARNING] No stat lines for match {match_id}; every team scores 0")
+    print(f"[INFO] {len(points)} players scored; {total} teams in {len(bounds)} shards "
+          f"across {workers} workers")
+
+    started = time.perf_counter()
+    written = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(db.DB_FILE, match_id, points)) as pool:
+        futures = [pool.submit(score_shard, b) for b in bounds]
+        with db.connection() as conn:
+            for done, future in enumerate(as_completed(futures), 1):
+                results = future.result()
+                conn.executemany(UPSERT, results)
+                conn.commit()
+                written += len(results)
+                rate = written / max(time.perf_counter() - started, 1e-9)
+                print(f"[INFO] Shard {done}/{len(bounds)}: {written}/{total} teams "
+                      f"({rate:,.0f} teams/s)")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score every saved team for one match.")
+    parser.add_argument("match_id", type=int, help="match to settle")
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to CPU count)")
+    parser.add_argument("--shards", type=int,
+                        help=f"work units (defaults to {SHARDS_PER_WORKER} per worker)")
+    parser.add_argument("--rules", help="rule set in rules/ (defaults to FANTASY_CRICKET_RULES)")
+    parser.add_argument("--snapshot", help="read stat lines from this snapshot file (see snapshot.py)")
+    args = parser.parse_args(argv)
+
+    print(f"Settling match {args.match_id}...\n")
+    started = time.perf_counter()
+    try:
+        written = settle(args.match_id, args.workers, args.shards, args.rules, args.snapshot)
+    except (sqlite3.Error, RuleError, SnapshotError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    print(f"\n[SUCCESS] Scored {written} teams for match {args.match_id} "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Frozen, memory-mapped copy of `stats` and `match` for read-heavy workers.
+
+    python snapshot.py export season.fcs
+    python snapshot.py info season.fcs
+
+An export writes one file (little-endian, sections 64-byte aligned):
+
+  header    HEADER: magic, format version, stat/player/line counts,
+            the stats_version and match_version it was taken at, the
+            creation time and the offset of every section below
+  columns   the stat column names, comma-separated, checked on open
+  players   PLAYER_RECORD per player, sorted by name: stats id (-1 if
+            the player has lines but no stats row), value, role and the
+            [start, start + count) range of their lines
+  names     int64 offsets into a UTF-8 blob, one name per player
+  lines     one int32 array per MATCH_STAT_COLUMNS entry, then match ids;
+            each player's lines are contiguous, ordered by match
+
+Readers map the file read-only with numpy.memmap and view the sections in
+place, so opening costs a header parse and every process shares one
+page-cached copy. Lookups by name bisect the sorted names without
+decoding them all. A file is never modified: re-exporting writes a new
+file and renames it over the old one, and get_snapshot() reopens it.
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from db import CHECK_INTERVAL, connection
+from schema import MATCH_STAT_COLUMNS, get_version
+from scoring_rules import get_rules
+from stat_lines import StatBlock
+
+MAGIC = b"FCSNAP\x00\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIIIqqd6Q")
+HEADER_SIZE = 128
+ALIGN = 64
+
+PLAYER_RECORD = np.dtype([("id", "<i4"), ("value", "<i4"), ("start", "<i4"),
+                          ("count", "<i4"), ("ctg", "S4")])
+
+SNAPSHOT_FILE = os.environ.get("FANTASY_CRICKET_SNAPSHOT")
+
+
+class SnapshotError(ValueError):
+    """Raised for a missing, truncated or incompatible snapshot file."""
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def export_snapshot(conn, path):
+    """Write `stats` and `match` as one consistent snapshot file at `path`.
+
+    Reads happen in a single read transaction; the file is written beside
+    `path` and renamed into place. Returns (players, lines).
+    """
+    opened = not conn.in_transaction
+    if opened:
+        conn.execute("BEGIN")
+    try:
+        stats_version = get_version(conn, "stats_version")
+        match_version = get_version(conn, "match_version")
+        stats = {player: (player_id, ctg, value) for player_id, player, ctg, value in conn.execute(
+            "SELECT id, player, ctg, COALESCE(CAST(value AS INTEGER), 0) FROM stats")}
+        block = StatBlock.load(conn)
+    finally:
+        if opened:
+            conn.rollback()
+
+    names = sorted(stats.keys() | set(block.players))
+    rank = {name: i for i, name in enumerate(names)}
+    if len(block):
+        line_rank = np.array([rank[p] for p in block.players], dtype=np.int64)[block.player_ids]
+        order = np.lexsort((block.match_ids, line_rank))
+        columns = block.columns[:, order]
+        match_ids = block.match_ids[order]
+        counts = np.bincount(line_rank, minlength=len(names))
+    else:
+        columns = np.zeros((len(MATCH_STAT_COLUMNS), 0), dtype=np.int32)
+        match_ids = np.zeros(0, dtype=np.int32)
+        counts = np.zeros(len(names), dtype=np.int64)
+
+    players = np.zeros(len(names), dtype=PLAYER_RECORD)
+    players["start"] = np.cumsum(counts) - counts
+    players["count"] = counts
+    rows = [stats.get(name, (-1, "", 0)) for name in names]
+    players["id"] = [player_id for player_id, _, _ in rows]
+    players["value"] = [value for _, _, value in rows]
+    players["ctg"] = [(ctg or "").encode() for _, ctg, _ in rows]
+
+    encoded = [name.encode("utf-8") for name in names]
+    name_offsets = np.zeros(len(names) + 1, dtype="<i8")
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+    sections = [",".join(MATCH_STAT_COLUMNS).encode(), players.tobytes(),
+                name_offsets.tobytes(), b"".join(encoded),
+                np.ascontiguousarray(columns, dtype="<i4").tobytes(),
+                np.ascontiguousarray(match_ids, dtype="<i4").tobytes()]
+
+    offsets, position = [], HEADER_SIZE
+    for section in sections:
+        offsets.append(position)
+        position = _aligned(position + len(section))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(MATCH_STAT_COLUMNS), len(names),
+                         len(match_ids), stats_version, match_version, time.time(), *offsets)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            for offset, section in zip(offsets, sections):
+                f.seek(offset)
+                f.write(section)
+            f.truncate(position)
+            f.flush()
+            os.fsync(f.fileno())
+        # Readable by workers running as other users
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return len(names), len(match_ids)
+
+
+class _Names:
+    """Sequence view of the names section; decodes only what is indexed."""
+
+    def __init__(self, offsets, blob):
+        # memoryviews index to plain ints and bytes, without numpy scalars
+        self._offsets = memoryview(offsets).cast("B").cast("q")
+        self._blob = memoryview(blob)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+
+class Snapshot:
+    """A read-only, memory-mapped snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            data = np.memmap(path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot open snapshot {path}: {e}")
+        if len(data) < HEADER_SIZE:
+            raise SnapshotError(f"{path} is not a snapshot file")
+        (magic, version, n_stats, n_players, n_lines, self.stats_version, self.match_version,
+         self.created_at, *offsets) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot file")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is format {version}; this reader needs {FORMAT_VERSION}")
+        columns_at, players_at, offsets_at, names_at, lines_at, match_ids_at = offsets
+        columns = bytes(data[columns_at:players_at]).rstrip(b"\0").decode()
+        if tuple(columns.split(",")) != MATCH_STAT_COLUMNS or n_stats != len(MATCH_STAT_COLUMNS):
+            raise SnapshotError(f"{path} has columns {columns}; expected {','.join(MATCH_STAT_COLUMNS)}")
+        if len(data) < match_ids_at + 4 * n_lines:
+            raise SnapshotError(f"{path} is truncated")
+
+        self._data = data
+        self.players = data[players_at:players_at + PLAYER_RECORD.itemsize * n_players].view(PLAYER_RECORD)
+        name_offsets = data[offsets_at:offsets_at + 8 * (n_players + 1)].view("<i8")
+        self.names = _Names(name_offsets, data[names_at:names_at + int(name_offsets[-1])])
+        self.columns = data[lines_at:lines_at + 4 * n_stats * n_lines].view("<i4").reshape(n_stats, n_lines)
+        self.match_ids = data[match_ids_at:match_ids_at + 4 * n_lines].view("<i4")
+        self._starts = self.players["start"]
+
+    @property
+    def version(self):
+        return self.stats_version, self.match_version
+
+    def __len__(self):
+        """Stat lines in the snapshot."""
+        return self.columns.shape[1]
+
+    def find(self, name):
+        """Player row for `name`, or None."""
+        i = bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            return i
+        return None
+
+    def info(self, name):
+        """(stats id, role, value) for `name`, or None if unknown."""
+        i = self.find(name)
+        if i is None:
+            return None
+        record = self.players[i]
+        return int(record["id"]), record["ctg"].decode(), int(record["value"])
+
+    def line_range(self, name):
+        i = self.find(name)
+        if i is None:
+            return 0, 0
+        start = int(self.players[i]["start"])
+        return start, start + int(self.players[i]["count"])
+
+    def block(self, players):
+        """StatBlock holding just these players' lines (a small copy)."""
+        players = list(dict.fromkeys(players))
+        ranges = [self.line_range(p) for p in players]
+        lines = np.concatenate([np.arange(a, b) for a, b in ranges]) if ranges else np.zeros(0, dtype=np.int64)
+        ids = np.repeat(np.arange(len(players), dtype=np.int32), [b - a for a, b in ranges])
+        return StatBlock(players, ids, np.asarray(self.columns[:, lines]), np.asarray(self.match_ids[lines]))
+
+    def player_totals(self, rules=None):
+        """{player: points over all their lines} for players with lines,
+        as StatBlock.player_totals gives."""
+        if not len(self):
+            return {}
+        scores = get_rules(rules).score_columns(self.columns)
+        running = np.concatenate(([0], np.cumsum(scores)))
+        scored = np.flatnonzero(self.players["count"] > 0)
+        starts = self._starts[scored].astype(np.int64)
+        totals = running[starts + self.players["count"][scored]] - running[starts]
+        return {self.names[i]: total for i, total in zip(scored.tolist(), totals.tolist())}
+
+    def match_points(self, match_id, rules=None):
+        """{stats id: points} for everyone with a line in `match_id`."""
+        lines = np.flatnonzero(self.match_ids == match_id)
+        if not len(lines):
+            return {}
+        scores = get_rules(rules).score_columns(self.columns[:, lines])
+        rows = np.searchsorted(self._starts, lines, side="right") - 1
+        ids = self.players["id"][rows]
+        known = ids >= 0
+        return dict(zip(ids[known].tolist(), scores[known].tolist()))
+
+    def is_current(self, conn):
+        """True if `stats` and `match` have not changed since the export."""
+        return self.version == (get_version(conn, "stats_version"), get_version(conn, "match_version"))
+
+
+_snapshot = None
+_snapshot_signature = None
+_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(path=None):
+    """The snapshot at `path` (default FANTASY_CRICKET_SNAPSHOT), or None
+    when none is configured or the file does not exist.
+
+    The file is re-checked at most once per CHECK_INTERVAL and reopened
+    after a re-export.
+    """
+    global _snapshot, _snapshot_signature, _checked_at
+    path = path or SNAPSHOT_FILE
+    if not path:
+        return None
+    now = time.monotonic()
+    if _snapshot is not None and _snapshot.path == path and now - _checked_at < CHECK_INTERVAL:
+        return _snapshot
+    with _snapshot_lock:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            _snapshot = _snapshot_signature = None
+            return None
+        signature = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != _snapshot_signature:
+            _snapshot = Snapshot(path)
+            _snapshot_signature = signature
+        _checked_at = now
+        return _snapshot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or inspect a scoring snapshot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="freeze stats and match into a snapshot file")
+    export.add_argument("path", nargs="?", default=SNAPSHOT_FILE, help="defaults to FANTASY_CRICKET_SNAPSHOT")
+    info = commands.add_parser("info", help="describe a snapshot file")
+    info.add_argument("path", nargs="?", default=SNAPSHOT_FILE, help="defaults to FANTASY_CRICKET_SNAPSHOT")
+    args = parser.parse_args(argv)
+    if not args.path:
+        parser.error("path required (or set FANTASY_CRICKET_SNAPSHOT)")
+
+    try:
+        if args.command == "export":
+            started = time.perf_counter()
+            with connection() as conn:
+                players, lines = export_snapshot(conn, args.path)
+            print(f"[SUCCESS] Wrote {players} players, {lines} stat lines to {args.path} "
+                  f"({os.path.getsize(args.path):,} bytes) in {time.perf_counter() - started:.2f}s")
+        else:
+            snap = Snapshot(args.path)
+            print(f"[INFO] {args.path}: format {FORMAT_VERSION}, {len(snap.names)} players, "
+                  f"{len(snap)} stat lines")
+            print(f"[INFO] stats_version {snap.stats_version}, match_version {snap.match_version}, "
+                  f"exported {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snap.created_at))}")
+    except (OSError, SnapshotError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import numpy as np
+
+from catalogue import get_catalogue
+from scoring_engine import calculate_scores
+from team_validation import BUDGET, ROLE_MINIMUMS, TEAM_SIZE
+
+_NEG = np.iinfo(np.int64).min // 4
+
+
+def _role_table(players, team_size, budget):
+    """Exact-cardinality, exact-cost 0/1 knapsack over one role.
+
+    Returns (best, take): best[k, c] is the most points from exactly k
+    players costing exactly c; take[i] marks the states player i improved.
+    """
+    best = np.full((team_size + 1, budget + 1), _NEG, dtype=np.int64)
+    best[0, 0] = 0
+    take = np.zeros((len(players), team_size + 1, budget + 1), dtype=bool)
+    for i, (_, value, points) in enumerate(players):
+        if value > budget:
+            continue
+        source = best[:-1, :budget + 1 - value]
+        candidate = np.where(source > _NEG, source + points, _NEG)
+        target = best[1:, value:]
+        better = candidate > target
+        target[better] = candidate[better]
+        take[i, 1:, value:] = better
+    return best, take
+
+
+def _pick_role(players, take, k, c):
+    picked = []
+    for i in range(len(players) - 1, -1, -1):
+        if k == 0:
+            break
+        if take[i, k, c]:
+            picked.append(players[i][0])
+            k -= 1
+            c -= players[i][1]
+    return picked
+
+
+def _combine(a, b):
+    """Max-plus convolution of two (k, cost) tables, with argmax split."""
+    rows, cols = a.shape
+    out = np.full_like(a, _NEG)
+    split_k = np.zeros(a.shape, dtype=np.int64)
+    split_c = np.zeros(a.shape, dtype=np.int64)
+    for k1, c1 in zip(*np.nonzero(a > _NEG)):
+        part = b[:rows - k1, :cols - c1]
+        candidate = np.where(part > _NEG, part + a[k1, c1], _NEG)
+        target = out[k1:, c1:]
+        better = candidate > target
+        target[better] = candidate[better]
+        split_k[k1:, c1:][better] = k1
+        split_c[k1:, c1:][better] = c1
+    return out, split_k, split_c
+
+
+def _prune(players, limit):
+    """Drop players that can never be picked: for each cost, only the best
+    `limit` of a role are ever worth taking. Keeps the DP small for
+    pools of thousands."""
+    kept = {}
+    for player in sorted(players, key=lambda p: (-p[2], p[0])):
+        bucket = kept.setdefault(player[1], [])
+        if len(bucket) < limit:
+            bucket.append(player)
+    return [p for bucket in kept.values() for p in bucket]
+
+
+def best_team(candidates, budget=BUDGET, team_size=TEAM_SIZE, role_minimums=ROLE_MINIMUMS):
+    """Highest-scoring team of exactly `team_size` within `budget`.
+
+    `candidates` are (name, role, value, points) tuples. Every role in
+    `role_minimums` must be filled at least that many times; other roles
+    may fill the remaining slots. Returns (players, total_points, cost),
+    or None when no team satisfies the constraints.
+    """
+    if budget < 0:
+        raise ValueError(f"budget must not be negative: {budget}")
+    by_role = {}
+    for name, role, value, points in candidates:
+        by_role.setdefault(role, []).append((name, int(value), int(points)))
+    for role in role_minimums:
+        by_role.setdefault(role, [])
+
+    roles = sorted(by_role)
+    tables = []
+    for role in roles:
+        players = _prune(by_role[role], team_size)
+        best, take = _role_table(players, team_size, budget)
+        best[:role_minimums.get(role, 0)] = _NEG
+        tables.append((players, best, take))
+
+    combined = tables[0][1]
+    splits = []
+    for _, best, _ in tables[1:]:
+        combined, split_k, split_c = _combine(combined, best)
+        splits.append((split_k, split_c))
+
+    row = combined[team_size]
+    if row.max() <= _NEG:
+        return None
+    cost = int(row.argmax())
+    total = int(row[cost])
+
+    # Walk the combine chain backwards to recover each role's (k, cost)
+    k, c = team_size, cost
+    picked = []
+    for (players, _, take), (split_k, split_c) in zip(reversed(tables[1:]), reversed(splits)):
+        k1, c1 = int(split_k[k, c]), int(split_c[k, c])
+        picked.extend(_pick_role(players, take, k - k1, c - c1))
+        k, c = k1, c1
+    players, _, take = tables[0]
+    picked.extend(_pick_role(players, take, k, c))
+    return picked, total, cost
+
+
+def suggest_team(budget=BUDGET, team_size=TEAM_SIZE, role_minimums=ROLE_MINIMUMS):
+    """best_team() over the whole catalogue, projecting each player's
+    points with scoring_engine."""
+    players = get_catalogue().all_players()
+    points = calculate_scores(info.name for info in players)
+    candidates = [(info.name, info.ctg, info.value, points[info.name]) for info in players]
+    return best_team(candidates, budget, team_size, role_minimums)
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import live_scoring
+
+
+class UnknownPlayerError(ValueError):
+    """Raised when a team references a name that is not in stats."""
+
+
+def player_ids(conn, players):
+    """Map player names to stats ids; raises UnknownPlayerError for misses."""
+    names = list(dict.fromkeys(players))
+    if not names:
+        return {}
+    marks = ",".join("?" * len(names))
+    ids = dict(conn.execute(f"SELECT player, id FROM stats WHERE player IN ({marks})", names).fetchall())
+    missing = [p for p in names if p not in ids]
+    if missing:
+        raise UnknownPlayerError(f"Unknown player: {missing[0]}")
+    return ids
+
+
+def save_team(conn, team_name, players, points_used, ids=None):
+    """Insert or replace a team and its slots in the caller's transaction.
+
+    Pass `ids` ({name: stats id}) if the caller already looked them up.
+    """
+    if ids is None:
+        ids = player_ids(conn, players)
+    conn.execute("DELETE FROM team_players WHERE team_name=?", (team_name,))
+    # Upsert rather than replace, so a re-save keeps created_at and rowid
+    conn.execute("""INSERT INTO teams (name, points_used, created_at) VALUES (?,?,?)
+                    ON CONFLICT (name) DO UPDATE SET points_used = excluded.points_used""",
+                 (team_name, points_used, datetime.now().isoformat()))
+    conn.executemany("INSERT INTO team_players (team_name, player_id, slot) VALUES (?,?,?)",
+                     [(team_name, ids[p], slot) for slot, p in enumerate(players)])
+    live_scoring.refresh_team_total(conn, team_name)
+
+
+def delete_team(conn, team_name):
+    conn.execute("DELETE FROM team_players WHERE team_name=?", (team_name,))
+    conn.execute("DELETE FROM team_totals WHERE team_name=?", (team_name,))
+    conn.execute("DELETE FROM team_match_scores WHERE team_name=?", (team_name,))
+    conn.execute("DELETE FROM teams WHERE name=?", (team_name,))
+
+
+def team_players(conn, team_name):
+    """Player names of one team in slot order, or None if the team is missing."""
+    rows = conn.execute("""SELECT s.player FROM teams t
+                           LEFT JOIN team_players tp ON tp.team_name = t.name
+                           LEFT JOIN stats s ON s.id = tp.player_id
+                           WHERE t.name=? ORDER BY tp.slot""", (team_name,)).fetchall()
+    if not rows:
+        return None
+    return [row[0] for row in rows if row[0] is not None]
+
+
+def list_teams(conn, limit, before=None, prefix=None, player=None, with_players=True):
+    """One page of teams, newest first, by keyset on rowid.
+
+    Returns ([(name, players, points_used, created_at)], next_cursor).
+    `before` is a cursor from a previous page; `prefix` filters by name
+    and `player` to teams containing that player. With `with_players`
+    off, players is None and team_players is not read.
+    """
+    where, params = [], []
+    if before is not None:
+        where.append("t.rowid < ?")
+        params.append(before)
+    if prefix:
+        # A range on the primary key index, unlike LIKE
+        where.append("t.name >= ? AND t.name < ?")
+        params += [prefix, prefix + "\U0010ffff"]
+    if player is not None:
+        where.append("""t.name IN (SELECT tp.team_name FROM stats s
+                                   JOIN team_players tp ON tp.player_id = s.id
+                                   WHERE s.player = ?)""")
+        params.append(player)
+    query = "SELECT t.rowid, t.name, t.points_used, t.created_at FROM teams t"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY t.rowid DESC LIMIT ?"
+    rows = conn.execute(query, params + [limit + 1]).fetchall()
+
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    rows = rows[:limit]
+
+    lineups = {}
+    if with_players and rows:
+        names = [row[1] for row in rows]
+        marks = ",".join("?" * len(names))
+        for team_name, name in conn.execute(f"""SELECT tp.team_name, s.player FROM team_players tp
+                                                 JOIN stats s ON s.id = tp.player_id
+                                                 WHERE tp.team_name IN ({marks})
+                                                 ORDER BY tp.team_name, tp.slot""", names):
+            lineups.setdefault(team_name, []).append(name)
+    teams = [(name, lineups.get(name, []) if with_players else None, points_used, created_at)
+             for _, name, points_used, created_at in rows]
+    return teams, next_cursor
+
+
+def teams_containing(conn, player):
+    """Names of teams that contain a player (index lookup, not a scan)."""
+    rows = conn.execute("""SELECT DISTINCT tp.team_name FROM stats s
+                           JOIN team_players tp ON tp.player_id = s.id
+                           WHERE s.player=?""", (player,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def ownership(conn, player=None):
+    """Teams owning each player and the percentage of all teams.
+
+    Returns {player: (team_count, percent)}; pass `player` for just one.
+    """
+    total = conn.execute("SELECT COUNT(*) FROM teams").fetchone()[0]
+    query = """SELECT s.player, COUNT(DISTINCT tp.team_name) FROM team_players tp
+               JOIN stats s ON s.id = tp.player_id"""
+    params = ()
+    if player is not None:
+        query += " WHERE s.player=?"
+        params = (player,)
+    query += " GROUP BY tp.player_id"
+    result = {}
+    for name, count in conn.execute(query, params).fetchall():
+        result[name] = (count, round(100.0 * count / total, 2) if total else 0.0)
+    return result
@@ -0,0 +1,94 @@
+"""Team rules: budget cap, team size, duplicates and role composition.
+
+check_lineup() applies the rules to player info already in hand (the
+Tk client uses catalogue entries); validate_team() fetches every
+player's id, role and value with one IN-query and checks them inside
+the caller's transaction; save_team() validates and writes.
+"""
+from collections import Counter, namedtuple
+
+import team_store
+
+BUDGET = 100
+TEAM_SIZE = 11
+ROLE_MINIMUMS = {'WK': 1, 'BAT': 3, 'BWL': 3, 'AR': 1}
+
+# (role, value) for one player, as check_lineup() needs it
+PlayerCost = namedtuple("PlayerCost", ["ctg", "value"])
+
+Lineup = namedtuple("Lineup", ["players", "ids", "points_used", "roles"])
+
+
+class TeamValidationError(ValueError):
+    """Raised when a lineup breaks a team rule."""
+
+
+def check_lineup(players, costs, budget=BUDGET, team_size=TEAM_SIZE,
+                 role_minimums=ROLE_MINIMUMS, require_complete=False):
+    """Check a lineup against the team rules.
+
+    `costs` maps each player to something with .ctg and .value (a
+    PlayerCost or catalogue PlayerInfo). A partial lineup passes if it can
+    still be completed into a legal XI; with `require_complete` it must
+    already be one. Returns (points_used, {role: count}).
+    """
+    if not players:
+        raise TeamValidationError("Add at least one player")
+    duplicates = [p for p, n in Counter(players).items() if n > 1]
+    if duplicates:
+        raise TeamValidationError(f"Player picked more than once: {duplicates[0]}")
+    if len(players) > team_size:
+        raise TeamValidationError(f"A team has at most {team_size} players")
+    missing = [p for p in players if p not in costs]
+    if missing:
+        raise team_store.UnknownPlayerError(f"Unknown player: {missing[0]}")
+
+    points_used = sum(costs[p].value for p in players)
+    if points_used > budget:
+        raise TeamValidationError(f"Team exceeds {budget} points")
+
+    roles = Counter(costs[p].ctg for p in players)
+    short = {role: n - roles[role] for role, n in role_minimums.items() if roles[role] < n}
+    if require_complete and len(players) < team_size:
+        raise TeamValidationError(f"A team needs {team_size} players")
+    left = team_size - len(players)
+    if sum(short.values()) > left:
+        needed = ", ".join(f"{n} {role}" for role, n in sorted(short.items()))
+        raise TeamValidationError(f"Team still needs {needed} but has only "
+                                  f"{left} slot{'s' if left != 1 else ''} left")
+    return points_used, dict(roles)
+
+
+def fetch_costs(conn, players):
+    """{name: (id, PlayerCost)} for the named players, in one query."""
+    names = list(dict.fromkeys(players))
+    if not names:
+        return {}
+    marks = ",".join("?" * len(names))
+    rows = conn.execute(f"""SELECT player, id, ctg, COALESCE(CAST(value AS INTEGER), 0)
+                            FROM stats WHERE player IN ({marks})""", names).fetchall()
+    return {player: (player_id, PlayerCost(ctg, value)) for player, player_id, ctg, value in rows}
+
+
+def validate_team(conn, players, require_complete=False):
+    """Fetch and check a lineup inside the caller's transaction."""
+    players = list(players)
+    # Never look up more names than a team can hold
+    fetched = fetch_costs(conn, players[:TEAM_SIZE + 1])
+    costs = {name: cost for name, (_, cost) in fetched.items()}
+    points_used, roles = check_lineup(players, costs, require_complete=require_complete)
+    return Lineup(players, {name: player_id for name, (player_id, _) in fetched.items()},
+                  points_used, roles)
+
+
+def save_team(conn, team_name, players, require_complete=False):
+    """Validate and save a team in the caller's transaction.
+
+    Start that transaction with db.begin_write(conn) so the values checked
+    are the values committed. Returns the Lineup saved.
+    """
+    if not team_name:
+        raise TeamValidationError("Team name required")
+    lineup = validate_team(conn, players, require_complete)
+    team_store.save_team(conn, team_name, lineup.players, lineup.points_used, lineup.ids)
+    return lineup